@@ -7,23 +7,328 @@
 """
 
 import os
+import re
 import sys
-import glob
+import fnmatch
+import json
+import math
+import mmap
+import time
+import pickle
+import shutil
+import hashlib
+import tempfile
 import argparse
+import functools
+import itertools
+import multiprocessing
+import queue
+import socket
+import threading
+import unicodedata
+import uuid
+from collections import deque, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime
 
-# 导入 PaddleOCR
-try:
-    from paddleocr import PPStructure, save_structure_res
-except ImportError:
-    print("=" * 80)
-    print("错误: 无法导入 PaddleOCR 的表格识别模块")
-    print("=" * 80)
-    print("\n请安装 PaddleOCR:")
-    print("  pip install paddleocr==2.7.3")
-    print("=" * 80)
-    sys.exit(1)
+from table_html import parse_table
+
+@functools.lru_cache(maxsize=None)
+def _paddleocr():
+    """
+    导入 PaddleOCR
+
+    导入 paddleocr 会连带导入 paddle，耗时数秒。推迟到真正创建引擎或保存结果时才导入，
+    --help、空目录、全部命中断点续跑等情况不必付出这部分启动开销。
+
+    Returns:
+        paddleocr 模块
+    """
+    try:
+        import paddleocr
+    except ImportError:
+        print("=" * 80)
+        print("错误: 无法导入 PaddleOCR 的表格识别模块")
+        print("=" * 80)
+        print("\n请安装 PaddleOCR:")
+        print("  pip install paddleocr==2.7.3")
+        print("=" * 80)
+        sys.exit(1)
+    return paddleocr
+
+
+# 始终识别的图片扩展名（不区分大小写）
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+# 支持的识别语言（--lang 的可选值；语言规则、旁注文件和服务请求中的语言也须在其中）
+SUPPORTED_LANGS = ('ch', 'en', 'korean')
+
+
+def iter_image_files(image_dir, image_pattern='*.jpg', recursive=False, exclude_dirs=()):
+    """
+    单次流式扫描目录中的图片文件
+
+    使用 os.scandir 一边扫描一边产出路径，不构建完整列表，也不逐个 stat。
+    文件名与 image_pattern 或 IMAGE_EXTENSIONS 匹配（不区分大小写）即产出。
+
+    Args:
+        image_dir: 图片目录
+        image_pattern: 文件匹配模式
+        recursive: 是否递归扫描子目录（跳过隐藏目录）
+        exclude_dirs: 递归时跳过的目录（如输出目录）
+
+    Yields:
+        图片路径，顺序为目录遍历顺序
+    """
+    pattern = image_pattern.lower()
+    excluded = {os.path.realpath(d) for d in exclude_dirs}
+    pending_dirs = [image_dir]
+
+    while pending_dirs:
+        current_dir = pending_dirs.pop()
+        try:
+            with os.scandir(current_dir) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_file():
+                            name = entry.name.lower()
+                            if name.endswith(IMAGE_EXTENSIONS) or fnmatch.fnmatchcase(name, pattern):
+                                yield entry.path
+                        elif (recursive and entry.is_dir(follow_symlinks=False)
+                              and not entry.name.startswith('.')
+                              and os.path.realpath(entry.path) not in excluded):
+                            pending_dirs.append(entry.path)
+                    except OSError:
+                        continue
+        except OSError as e:
+            print(f"  ⚠ 无法读取目录 {current_dir}: {str(e)}")
+
+
+def jpeg_dimensions(buffer):
+    """
+    从 JPEG 文件头读取图片尺寸（不解码）
+
+    Args:
+        buffer: 文件内容（bytes 或 uint8 数组）
+
+    Returns:
+        (宽, 高)，不是 JPEG 或文件头损坏时返回 None
+    """
+    data = memoryview(buffer).cast('B')
+    size = len(data)
+    if size < 4 or data[0] != 0xFF or data[1] != 0xD8:
+        return None
+
+    pos = 2
+    while pos + 9 < size:
+        if data[pos] != 0xFF:
+            return None
+        marker = data[pos + 1]
+        if marker == 0xFF:
+            # 填充字节
+            pos += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:
+            # 没有长度字段的标记
+            pos += 2
+            continue
+        # SOF0~SOF15（排除 DHT、JPG、DAC）中包含图片尺寸
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            height = (data[pos + 5] << 8) | data[pos + 6]
+            width = (data[pos + 7] << 8) | data[pos + 8]
+            return width, height
+        pos += 2 + ((data[pos + 2] << 8) | data[pos + 3])
+    return None
+
+
+# 视为网络文件系统的挂载类型，这些文件系统上内存映射没有收益甚至更慢
+NETWORK_FS_TYPES = {
+    'nfs', 'nfs4', 'cifs', 'smb', 'smb2', 'smb3', 'smbfs', 'ncpfs', 'afs', '9p',
+    'fuse.sshfs', 'fuse.s3fs', 'fuse.gcsfuse', 'fuse.rclone', 'glusterfs',
+    'fuse.glusterfs', 'ceph', 'fuse.ceph', 'lustre', 'gpfs', 'beegfs', 'davfs'
+}
+
+
+@functools.lru_cache(maxsize=1)
+def _mount_table():
+    """读取 /proc/mounts，返回按挂载点长度降序排列的 [(挂载点, 文件系统类型)]"""
+    mounts = []
+    try:
+        # 与 os 模块解码路径的方式一致，非 UTF-8 的字节也能原样对应
+        with open('/proc/mounts', 'r', encoding='utf-8', errors='surrogateescape') as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) >= 3:
+                    # 挂载点中的空格、制表符、换行和反斜杠以 \ooo 八进制转义，其余字符（含中文）原样保留
+                    mount_point = re.sub(r'\\([0-7]{3})', lambda m: chr(int(m.group(1), 8)), fields[1])
+                    mounts.append((mount_point, fields[2]))
+    except OSError:
+        pass
+    mounts.sort(key=lambda m: len(m[0]), reverse=True)
+    return mounts
+
+
+@functools.lru_cache(maxsize=1024)
+def _is_network_dir(directory):
+    """判断目录是否位于网络文件系统上"""
+    if sys.platform == 'win32':
+        if directory.startswith('\\\\'):
+            return True
+        try:
+            import ctypes
+            drive = os.path.splitdrive(directory)[0] + '\\'
+            # DRIVE_REMOTE = 4
+            return ctypes.windll.kernel32.GetDriveTypeW(drive) == 4
+        except Exception:
+            return False
+
+    for mount_point, fs_type in _mount_table():
+        if directory == mount_point or directory.startswith(mount_point.rstrip('/') + '/'):
+            return fs_type in NETWORK_FS_TYPES
+    return False
+
+
+def read_image_buffer(image_path, use_mmap=False):
+    """
+    读取图片文件内容，返回 uint8 数组
+
+    use_mmap 为 True 且文件位于本地文件系统时，把文件内存映射后返回只读的
+    零拷贝视图，解码器直接读取页缓存，不再复制一份文件内容；
+    映射在数组被释放时自动解除。网络文件系统、空文件或映射失败时
+    改用 np.fromfile 普通读取。
+
+    Args:
+        image_path: 图片路径
+        use_mmap: 是否尝试内存映射
+
+    Returns:
+        numpy uint8 数组
+    """
+    import numpy as np
+
+    if use_mmap and not _is_network_dir(os.path.dirname(os.path.realpath(image_path))):
+        try:
+            with open(image_path, 'rb') as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            if hasattr(mapped, 'madvise') and hasattr(mmap, 'MADV_SEQUENTIAL'):
+                mapped.madvise(mmap.MADV_SEQUENTIAL)
+            return np.frombuffer(mapped, dtype=np.uint8)
+        except (OSError, ValueError):
+            pass
+
+    return np.fromfile(image_path, dtype=np.uint8)
+
+
+# 低内存模式下每个流水线阶段最多在途的图片数
+LOW_MEMORY_IN_FLIGHT = 2
+
+
+def strip_image_crops(result):
+    """
+    丢弃识别结果中各区域的裁剪图（原地修改）
+
+    图片区域（figure）的裁剪图是 save_structure_res 唯一会写出的图片，予以保留；
+    其余区域的 img 置为 None（save_structure_res 依赖该字段存在）。
+
+    Args:
+        result: PPStructure 识别结果
+
+    Returns:
+        result
+    """
+    for item in result:
+        if item.get('type', '').lower() != 'figure' and 'img' in item:
+            item['img'] = None
+    return result
+
+
+def peak_rss():
+    """
+    当前进程及已结束子进程的内存峰值（常驻内存，MB）
+
+    Returns:
+        (本进程峰值, 子进程中的最大峰值)，无法获取时为 None
+    """
+    try:
+        import resource
+    except ImportError:
+        # Windows 没有 resource 模块
+        try:
+            import psutil
+            return psutil.Process().memory_info().peak_wset / (1024 * 1024), None
+        except Exception:
+            return None, None
+
+    # Linux 上 ru_maxrss 单位为 KB，macOS 上为字节
+    divisor = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / divisor
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / divisor
+    return own, children
+
+
+def process_rss(pid):
+    """
+    指定进程当前的常驻内存（MB）
+
+    Returns:
+        常驻内存，无法获取时为 None
+    """
+    try:
+        with open(f'/proc/{pid}/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import psutil
+        return psutil.Process(pid).memory_info().rss / (1024 * 1024)
+    except Exception:
+        return None
+
+
+def available_cpus():
+    """当前进程可用的 CPU 核数（考虑 CPU 亲和性，如容器或 taskset 限制）"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+# 各数学库读取的线程数环境变量，须在导入 paddle 之前设置
+MATH_THREAD_ENV_VARS = ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS')
+
+
+def set_math_threads(threads):
+    """
+    设置当前进程数学库（OpenMP / MKL / OpenBLAS）的线程数
+
+    多个工作进程各自使用默认线程数（等于核数）时会互相抢占 CPU，
+    每个进程应只使用 核数 / 进程数 个线程。
+
+    数学库在 paddle 首次导入时读取这些环境变量，之后再设置不会生效，
+    因此只能在尚未导入 paddle 的进程中调用（如新 spawn 的工作进程在创建引擎前）。
+    """
+    for name in MATH_THREAD_ENV_VARS:
+        os.environ[name] = str(threads)
+
+
+def _throttled(items, semaphore):
+    """每产出一项先获取一次信号量，由消费方在处理完成后释放"""
+    for item in items:
+        semaphore.acquire()
+        yield item
+
+
+def _rjust(text, width):
+    """按终端显示宽度右对齐（中文等全角字符占两列）"""
+    text = str(text)
+    display = sum(2 if unicodedata.east_asian_width(ch) in ('W', 'F') else 1 for ch in text)
+    return ' ' * max(0, width - display) + text
+
+
+def _progress(idx, total):
+    """进度文本，总数未知时只显示序号"""
+    return f"{idx}/{total}" if total else str(idx)
 
 
 class BatchTableRecognizer:
@@ -32,7 +337,23 @@ class BatchTableRecognizer:
     def __init__(self,
                  output_dir='output',
                  use_gpu=True,
-                 lang='ch'):
+                 lang='ch',
+                 cache_dir=None,
+                 cache_size_mb=1024,
+                 cache_phash=False,
+                 max_side=0,
+                 crop_border=False,
+                 grayscale=False,
+                 fast_decode=False,
+                 use_mmap=False,
+                 low_memory=False,
+                 table_only=False,
+                 lang_rules=None,
+                 engine_factory=None,
+                 cpu_threads=None,
+                 enable_mkldnn=False,
+                 table_records=False,
+                 image_root=None):
         """
         初始化批量表格识别器
 
@@ -40,44 +361,201 @@ class BatchTableRecognizer:
             output_dir: 输出目录
             use_gpu: 是否使用 GPU
             lang: 语言，'ch'为中文，'en'为英文
+            cache_dir: 识别结果缓存目录，为 None 时不使用缓存
+            cache_size_mb: 缓存容量上限（MB），超出后按最近最少使用淘汰
+            cache_phash: 是否用感知哈希作为缓存键（重新压缩保存的重复图片也能命中）
+            max_side: 预处理时把长边缩小到不超过该像素数，0 表示不缩放
+            crop_border: 预处理时是否裁掉图片四周的空白边
+            grayscale: 预处理时是否转为灰度（仍以三通道送入引擎）
+            fast_decode: 是否对大尺寸 JPEG 按 max_side 直接以 1/2、1/4、1/8 分辨率解码
+            use_mmap: 是否以内存映射方式读取本地图片文件（网络文件系统上自动改用普通读取）
+            low_memory: 低内存模式：丢弃结果中的区域裁剪图，并限制批处理中同时在途的图片数
+            table_only: 纯表格模式：跳过版面分析，把整张图片（或裁剪空白边后的区域）
+                        直接作为一个表格识别，适合单表格截图
+            lang_rules: 按文件名选择语言的规则 [(正则表达式, 语言), ...]，
+                        与语言旁注文件一起决定每张图片使用哪个语言的引擎
+            engine_factory: 自定义引擎构造函数 engine_factory(lang)，返回与 PPStructure
+                            调用方式相同的引擎，为 None 时使用 PPStructure（基准测试用模拟引擎替换；
+                            多进程模式下需可被 pickle）
+            cpu_threads: CPU 推理的数学库线程数，为 None 时自动设置
+                         （单进程为可用核数，多进程为 可用核数 / 进程数）
+            enable_mkldnn: CPU 推理是否启用 MKLDNN 加速
+            table_records: 是否在保存结果时把表格的单元格文本写入表格记录旁路文件
+                           （output_dir/.tables/），merge_results.py --from_records 直接读取
+            image_root: 图片根目录，子目录中的图片按相对路径保存结果（a/1.jpg → output_dir/a/1/），
+                        避免递归扫描时不同子目录的同名图片互相覆盖；batch_recognize 会自动设置
         """
+        for config_lang in [lang] + [rule_lang for _, rule_lang in (lang_rules or [])]:
+            if config_lang not in SUPPORTED_LANGS:
+                raise ValueError(f"不支持的语言 {config_lang}（可选: {'、'.join(SUPPORTED_LANGS)}）")
+
         self.output_dir = output_dir
         os.makedirs(output_dir, exist_ok=True)
 
+        # 保存初始化参数，多进程模式下每个子进程用它重建各自的识别器
+        self._init_kwargs = {
+            'output_dir': output_dir,
+            'use_gpu': use_gpu,
+            'lang': lang,
+            'cache_dir': cache_dir,
+            'cache_size_mb': cache_size_mb,
+            'cache_phash': cache_phash,
+            'max_side': max_side,
+            'crop_border': crop_border,
+            'grayscale': grayscale,
+            'fast_decode': fast_decode,
+            'use_mmap': use_mmap,
+            'low_memory': low_memory,
+            'table_only': table_only,
+            'lang_rules': lang_rules,
+            'engine_factory': engine_factory,
+            'cpu_threads': cpu_threads,
+            'enable_mkldnn': enable_mkldnn,
+            'table_records': table_records,
+            'image_root': image_root
+        }
+
+        # 解码后的预处理参数，识别结果中的坐标会映射回原图
+        self.max_side = max_side
+        self.crop_border = crop_border
+        self.grayscale = grayscale
+        self.fast_decode = fast_decode
+        self.use_mmap = use_mmap
+        self.low_memory = low_memory
+        self.table_only = table_only
+        self.table_records = TableRecordLog(output_dir) if table_records else None
+        self.image_root = image_root
+
+        # 按语言懒加载的引擎池：默认语言在初始化时加载，其他语言首次用到时加载
+        self.lang = lang
+        self.use_gpu = use_gpu
+        self.engine_factory = engine_factory
+        self.cpu_threads = cpu_threads
+        self.enable_mkldnn = enable_mkldnn
+        self.lang_rules = [(re.compile(pattern), rule_lang)
+                           for pattern, rule_lang in (lang_rules or [])]
+        self._engines = {}
+        self._engine_lock = threading.Lock()
+
+        # 缓存键包含语言和识别模式，不同配置的识别结果互不复用
+        self.cache = None
+        if cache_dir:
+            self.cache = ResultCache(cache_dir, cache_size_mb, cache_phash,
+                                     namespace=self._cache_namespace(lang))
+
         print("=" * 80)
         print("初始化 PaddleOCR PPStructure")
         print("=" * 80)
         print(f"输出目录: {output_dir}")
         print(f"使用 GPU: {use_gpu}")
+        if not use_gpu:
+            threads = cpu_threads or f"自动（可用 {available_cpus()} 核）"
+            print(f"CPU 线程: {threads}，MKLDNN: {'开启' if enable_mkldnn else '关闭'}")
         print(f"语言: {lang}")
+        if self.lang_rules:
+            rules = '，'.join(f"{rule.pattern} → {rule_lang}" for rule, rule_lang in self.lang_rules)
+            print(f"语言规则: {rules}")
+        if table_only:
+            print("识别模式: 纯表格（跳过版面分析）")
+        if max_side or crop_border or grayscale:
+            steps = []
+            if grayscale:
+                steps.append("灰度")
+            if crop_border:
+                steps.append("裁剪空白边")
+            if max_side:
+                steps.append(f"长边缩放至 {max_side}px")
+                if fast_decode:
+                    steps.append("JPEG 降分辨率解码")
+            print(f"预处理: {'、'.join(steps)}")
+        if self.cache is not None:
+            print(f"结果缓存: {cache_dir}（上限 {cache_size_mb} MB，已缓存 {len(self.cache)} 项）")
         print("=" * 80)
-        print("\n正在加载模型（首次运行会自动下载模型，请耐心等待）...")
+
+    @property
+    def engine(self):
+        """默认语言的引擎，首次访问时加载"""
+        return self.get_engine(self.lang)
+
+    def get_engine(self, lang):
+        """
+        获取指定语言的引擎，首次使用时加载
+
+        Args:
+            lang: 语言
+
+        Returns:
+            PPStructure 引擎
+        """
+        engine = self._engines.get(lang)
+        if engine is None:
+            with self._engine_lock:
+                engine = self._engines.get(lang)
+                if engine is None:
+                    engine = self._create_engine(lang)
+                    self._engines[lang] = engine
+        return engine
+
+    def _create_engine(self, lang):
+        """
+        加载指定语言的 PPStructure 引擎
+
+        Args:
+            lang: 语言
+
+        Returns:
+            PPStructure 引擎
+        """
+        if self._engines:
+            print(f"\n正在加载 {lang} 语言模型...")
+        else:
+            print("\n正在加载模型（首次运行会自动下载模型，请耐心等待）...")
+
+        if self.engine_factory is not None:
+            engine = self.engine_factory(lang)
+            print("✓ 模型加载完成！\n")
+            return engine
+
+        # CPU 推理：线程数环境变量只在本进程首次导入 paddle 前生效（新 spawn 的工作进程），
+        # 已导入 paddle 时（如加载第二种语言的引擎）只有 cpu_threads 参数起作用
+        cpu_options = {}
+        if not self.use_gpu:
+            threads = self.cpu_threads or available_cpus()
+            set_math_threads(threads)
+            cpu_options = {'cpu_threads': threads, 'enable_mkldnn': self.enable_mkldnn}
+
+        PPStructure = _paddleocr().PPStructure
 
         # 初始化 PPStructure
         try:
-            self.lang = lang
+            # 纯表格模式关闭版面分析：PPStructure 会把整张图片作为一个表格区域，
+            # 表格识别自带文本检测和识别模型，不依赖版面分析的 OCR
+            layout = not self.table_only
 
             # 根据语言设置不同的配置
             if lang == 'korean':
                 # 韩文：使用韩文 OCR 模型 + 表格结构识别
-                self.engine = PPStructure(
+                engine = PPStructure(
                     show_log=True,
-                    use_gpu=use_gpu,
+                    use_gpu=self.use_gpu,
                     lang='korean',  # 使用韩文模型
                     table=True,
                     ocr=True,
-                    layout=True  # 必须启用才能保持 OCR 开启
+                    layout=layout,  # 必须启用才能保持 OCR 开启（非表格区域）
+                    **cpu_options
                 )
             else:
-                self.engine = PPStructure(
+                engine = PPStructure(
                     show_log=True,
-                    use_gpu=use_gpu,
+                    use_gpu=self.use_gpu,
                     lang=lang,
-                    table=True,  # 启用表格识别
-                    ocr=True,    # 启用 OCR
-                    layout=True  # 启用版面分析以保持 OCR 开启
+                    table=True,   # 启用表格识别
+                    ocr=True,     # 启用 OCR
+                    layout=layout,  # 启用版面分析以保持 OCR 开启（非表格区域）
+                    **cpu_options
                 )
             print("✓ 模型加载完成！\n")
+            return engine
         except Exception as e:
             print(f"\n✗ 模型初始化失败: {str(e)}")
             print("\n可能的原因:")
@@ -86,37 +564,298 @@ class BatchTableRecognizer:
             print("  3. GPU 驱动或 CUDA 问题")
             raise
 
-    def recognize_single_image(self, image_path):
+    def worker_init_kwargs(self, workers):
         """
-        识别单张图片中的表格
+        工作进程的初始化参数
+
+        CPU 推理且未指定 cpu_threads 时，把可用核数平均分给各工作进程，避免线程超额订阅。
+
+        Args:
+            workers: 工作进程数
+        """
+        init_kwargs = dict(self._init_kwargs)
+        if not self.use_gpu and not self.cpu_threads:
+            init_kwargs['cpu_threads'] = max(1, available_cpus() // max(1, workers))
+        return init_kwargs
+
+    def output_name(self, image_path):
+        """
+        图片的结果名：结果子目录相对 output_dir 的路径
+
+        image_root 子目录中的图片保留相对目录（a/1.jpg → a/1），其余为不含扩展名的文件名
+        """
+        stem = Path(image_path).stem
+        if self.image_root:
+            rel_dir = os.path.relpath(os.path.dirname(os.path.abspath(image_path)),
+                                      os.path.abspath(self.image_root))
+            if rel_dir != '.' and not rel_dir.startswith('..'):
+                return Path(rel_dir, stem).as_posix()
+        return stem
+
+    def _cache_namespace(self, lang):
+        """缓存键前缀：语言 + 识别模式"""
+        return f"{lang}-table" if self.table_only else lang
+
+    def resolve_lang(self, image_path):
+        """
+        决定图片使用的语言
+
+        优先级：语言旁注文件（与图片同名的 .lang 文件，如 a.jpg.lang 或 a.lang，
+        内容为语言代码）> 文件名规则 lang_rules（按顺序第一个匹配）> 默认语言。
+        旁注文件中的语言不做检查，不受支持时由 recognize_single_image 记为失败。
 
         Args:
             image_path: 图片路径
 
         Returns:
-            识别结果
+            语言代码
+        """
+        for sidecar in (image_path + '.lang', os.path.splitext(image_path)[0] + '.lang'):
+            try:
+                with open(sidecar, 'r', encoding='utf-8') as f:
+                    sidecar_lang = f.read().strip()
+                if sidecar_lang:
+                    return sidecar_lang
+            except OSError:
+                continue
+
+        name = os.path.basename(image_path)
+        for rule, rule_lang in self.lang_rules:
+            if rule.search(name):
+                return rule_lang
+
+        return self.lang
+
+    def load_image(self, image_path, timings=None):
+        """
+        读取并解码图片（不打印信息，可在后台线程中调用）
+
+        Args:
+            image_path: 图片路径
+            timings: 分阶段耗时字典，填入 read、decode 和 preprocess 耗时
+
+        Returns:
+            (预处理后的图片数组, 错误信息, 坐标变换)，成功时错误信息为 None
+        """
+        try:
+            # 检查图片是否存在
+            if not os.path.exists(image_path):
+                return None, "文件不存在", None
+
+            # 读取图片（不经过 cv2.imread，支持中文路径）
+            # cv2.imread 在 Windows 上无法处理中文文件名
+            start = time.perf_counter()
+            buffer = read_image_buffer(image_path, self.use_mmap)
+            decode_start = time.perf_counter()
+            img, error, decode_scale = self.decode_image(buffer)
+            preprocess_start = time.perf_counter()
+            transform = None
+            if img is not None:
+                img, transform = self.preprocess_image(img, decode_scale)
+            if timings is not None:
+                timings['read'] = decode_start - start
+                timings['decode'] = preprocess_start - decode_start
+                timings['preprocess'] = time.perf_counter() - preprocess_start
+            return img, error, transform
+
+        except Exception as e:
+            return None, f"读取失败: {str(e)}", None
+
+    def decode_image(self, buffer):
+        """
+        解码内存中的图片数据
+
+        启用 fast_decode 且设置了 max_side 时，先从 JPEG 文件头读取原图尺寸，
+        选择不小于 max_side 的最大缩小倍数（2/4/8），由解码器在 DCT 阶段直接
+        输出低分辨率图片，解码耗时和内存占用都随之下降。
+
+        Args:
+            buffer: 图片文件内容（bytes 或 uint8 数组）
+
+        Returns:
+            (图片数组, 错误信息, 解码缩放比例)，成功时错误信息为 None；
+            解码缩放比例 = 解码尺寸 / 原图尺寸，全分辨率解码时为 1.0
         """
         try:
             import cv2
             import numpy as np
-            print(f"正在处理: {Path(image_path).name}")
 
-            # 检查图片是否存在
-            if not os.path.exists(image_path):
-                print(f"  ✗ 错误: 文件不存在")
+            if isinstance(buffer, (bytes, bytearray, memoryview)):
+                buffer = np.frombuffer(buffer, dtype=np.uint8)
+
+            flags = cv2.IMREAD_COLOR
+            original_size = None
+            if self.fast_decode and self.max_side:
+                original_size = jpeg_dimensions(buffer)
+                if original_size is not None:
+                    long_side = max(original_size)
+                    for factor, reduced_flag in ((8, cv2.IMREAD_REDUCED_COLOR_8),
+                                                 (4, cv2.IMREAD_REDUCED_COLOR_4),
+                                                 (2, cv2.IMREAD_REDUCED_COLOR_2)):
+                        if long_side / factor >= self.max_side:
+                            flags = reduced_flag
+                            break
+
+            img = cv2.imdecode(buffer, flags)
+            if img is None:
+                return None, "无法读取图片", 1.0
+
+            decode_scale = 1.0
+            if flags != cv2.IMREAD_COLOR:
+                # 按长边计算，EXIF 方向旋转后宽高互换也不受影响
+                decode_scale = max(img.shape[:2]) / float(max(original_size))
+
+            return img, None, decode_scale
+
+        except Exception as e:
+            return None, f"解码失败: {str(e)}", 1.0
+
+    def preprocess_image(self, img, decode_scale=1.0):
+        """
+        推理前的预处理：灰度化、裁剪空白边、长边缩放
+
+        Args:
+            img: 解码后的图片数组（BGR）
+            decode_scale: 解码时已做的缩放比例（降分辨率解码）
+
+        Returns:
+            (处理后的图片数组, 坐标变换)，未做任何处理时坐标变换为 None；
+            坐标变换为 {'scale': 缩放比例, 'offset': (x, y)}，
+            原图坐标 = 处理后坐标 / scale + offset
+        """
+        if not (self.max_side or self.crop_border or self.grayscale) and decode_scale == 1.0:
+            return img, None
+
+        import cv2
+        import numpy as np
+
+        offset_x, offset_y = 0, 0
+        scale = 1.0
+
+        if self.grayscale or self.crop_border:
+            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+
+        if self.crop_border:
+            # 接近白色的像素视为背景，保留内容外一圈边距
+            ys, xs = np.nonzero(gray < 245)
+            if len(xs) > 0:
+                margin = 10
+                h, w = gray.shape
+                x1, x2 = max(0, xs.min() - margin), min(w, xs.max() + margin + 1)
+                y1, y2 = max(0, ys.min() - margin), min(h, ys.max() + margin + 1)
+                img = img[y1:y2, x1:x2]
+                gray = gray[y1:y2, x1:x2]
+                offset_x, offset_y = int(x1), int(y1)
+
+        if self.grayscale:
+            # 引擎要求三通道输入
+            img = cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR)
+
+        h, w = img.shape[:2]
+        if self.max_side and max(h, w) > self.max_side:
+            scale = self.max_side / float(max(h, w))
+            img = cv2.resize(img, (max(1, round(w * scale)), max(1, round(h * scale))),
+                             interpolation=cv2.INTER_AREA)
+
+        img = np.ascontiguousarray(img)
+        # 裁剪偏移是解码后图片上的坐标，换算到原图
+        return img, {'scale': scale * decode_scale,
+                     'offset': (offset_x / decode_scale, offset_y / decode_scale)}
+
+    @staticmethod
+    def restore_coordinates(result, transform):
+        """
+        把识别结果中的坐标从预处理后的图片映射回原图（原地修改）
+
+        区域 bbox 和文本行 text_region 是整图坐标，需要缩放并加上裁剪偏移；
+        表格 res 中的 cell_bbox / boxes 是相对表格区域的坐标，只需缩放。
+
+        Args:
+            result: PPStructure 识别结果
+            transform: preprocess_image 返回的坐标变换
+
+        Returns:
+            result
+        """
+        if not transform or not result:
+            return result
+
+        scale = transform['scale']
+        offset_x, offset_y = transform['offset']
+
+        def to_original(values, with_offset):
+            dx, dy = (offset_x, offset_y) if with_offset else (0, 0)
+            return [float(v) / scale + (dx if i % 2 == 0 else dy) for i, v in enumerate(values)]
+
+        for item in result:
+            if item.get('bbox') is not None:
+                item['bbox'] = [int(round(v)) for v in to_original(item['bbox'], True)]
+
+            res = item.get('res')
+            if isinstance(res, dict):
+                for key in ('cell_bbox', 'boxes'):
+                    if res.get(key) is not None:
+                        res[key] = [to_original(box, False) for box in res[key]]
+            elif isinstance(res, list):
+                for line in res:
+                    if isinstance(line, dict) and line.get('text_region') is not None:
+                        line['text_region'] = [to_original(point, True)
+                                               for point in line['text_region']]
+        return result
+
+    def recognize_single_image(self, image_path, preloaded=None, timings=None, lang=None):
+        """
+        识别单张图片中的表格
+
+        Args:
+            image_path: 图片路径
+            preloaded: 预先读取的 (图片数组, 错误信息, 坐标变换)，为 None 时在此读取
+            timings: 分阶段耗时字典，填入读取、解码和推理各阶段耗时
+            lang: 使用的语言，为 None 时由 resolve_lang 决定
+
+        Returns:
+            识别结果
+        """
+        try:
+            if lang is None:
+                lang = self.resolve_lang(image_path)
+            if lang not in SUPPORTED_LANGS:
+                # 不为未知语言加载模型
+                print(f"  ✗ 错误: {Path(image_path).name} 指定了不支持的语言 {lang}"
+                      f"（可选: {'、'.join(SUPPORTED_LANGS)}）")
                 return None
+            if lang == self.lang:
+                print(f"正在处理: {Path(image_path).name}")
+            else:
+                print(f"正在处理: {Path(image_path).name}（语言: {lang}）")
 
-            # 读取图片（使用 np.fromfile 支持中文路径）
-            # cv2.imread 在 Windows 上无法处理中文文件名
-            img = cv2.imdecode(np.fromfile(image_path, dtype=np.uint8), cv2.IMREAD_COLOR)
+            if preloaded is None:
+                preloaded = self.load_image(image_path, timings)
+            img, error, transform = preloaded
             if img is None:
-                print(f"  ✗ 错误: 无法读取图片")
+                print(f"  ✗ 错误: {error}")
                 return None
 
-            # 进行表格识别
-            result = self.engine(img)
+            # 内容相同的图片直接复用缓存的识别结果
+            # 缓存中保存的是预处理后图片上的坐标，取出后再映射回原图
+            cache_key = None
+            result = None
+            if self.cache is not None:
+                cache_key = self.cache.make_key(img, self._cache_namespace(lang))
+                result = self.cache.get(cache_key)
+
+            if result is not None:
+                print(f"  ✓ 命中缓存")
+            else:
+                # 进行表格识别
+                result = self._run_engine(img, timings, self.get_engine(lang))
+                if result and self.low_memory:
+                    strip_image_crops(result)
+                if result and cache_key is not None:
+                    self.cache.put(cache_key, result)
 
             if result:
+                self.restore_coordinates(result, transform)
                 table_count = sum(1 for item in result if item.get('type') == 'table')
                 print(f"  ✓ 识别成功，检测到 {table_count} 个表格")
                 return result
@@ -130,30 +869,116 @@ class BatchTableRecognizer:
             traceback.print_exc()
             return None
 
-    def save_results(self, image_path, results):
+    def _run_engine(self, img, timings=None, engine=None):
+        """
+        调用引擎识别图片，并记录引擎内部各阶段耗时
+
+        PPStructure.__call__ 会丢弃 StructureSystem 统计的分阶段耗时，
+        这里直接调用父类 StructureSystem.__call__ 取回 (结果, 耗时字典)；
+        引擎不是 StructureSystem 子类时退化为普通调用。
+
+        Args:
+            img: 图片数组（BGR）
+            timings: 分阶段耗时字典，填入 inference、layout、table、ocr
+            engine: 使用的引擎，默认为默认语言的引擎
+
+        Returns:
+            识别结果
+        """
+        engine = engine or self.engine
+        start = time.perf_counter()
+        engine_times = {}
+        structure_call = None
+        for cls in type(engine).__mro__[1:]:
+            if cls.__name__ == 'StructureSystem':
+                structure_call = cls.__call__
+                break
+
+        if structure_call is not None:
+            output = structure_call(engine, img)
+            if isinstance(output, tuple) and len(output) == 2 and isinstance(output[1], dict):
+                result, engine_times = output
+            else:
+                result = output
+        else:
+            result = engine(img)
+
+        if timings is not None:
+            timings['inference'] = time.perf_counter() - start
+            if engine_times:
+                timings['layout'] = engine_times.get('layout', 0.0)
+                timings['table'] = engine_times.get('table', 0.0) + engine_times.get('table_match', 0.0)
+                timings['ocr'] = engine_times.get('det', 0.0) + engine_times.get('rec', 0.0)
+        return result
+
+    def iter_prefetched_images(self, image_paths, depth=4, io_threads=None):
+        """
+        后台线程预读取并解码图片，与推理流水线并行
+
+        最多有 depth 张图片处于读取中或已解码待处理状态，
+        引擎处理当前图片时，后续图片的磁盘读取和解码同时进行。
+
+        Args:
+            image_paths: 图片路径列表
+            depth: 预读取队列深度
+            io_threads: 读取线程数（默认: min(depth, 4)）
+
+        Yields:
+            (图片路径, (图片数组, 错误信息, 坐标变换), 分阶段耗时)，顺序与输入一致
+        """
+        depth = max(1, depth)
+        io_threads = io_threads or min(depth, 4)
+        paths = iter(image_paths)
+        pending = deque()
+
+        def submit(executor, image_path):
+            timings = {}
+            future = executor.submit(self.load_image, image_path, timings)
+            pending.append((image_path, future, timings))
+
+        with ThreadPoolExecutor(max_workers=io_threads) as executor:
+            for image_path in itertools.islice(paths, depth):
+                submit(executor, image_path)
+
+            while pending:
+                image_path, future, timings = pending.popleft()
+                # 取出一张即补充一张，保持队列有界
+                for next_path in itertools.islice(paths, 1):
+                    submit(executor, next_path)
+                yield image_path, future.result(), timings
+
+    def save_results(self, image_path, results, timings=None):
         """
         保存识别结果
 
         Args:
             image_path: 原始图片路径
             results: 识别结果
+            timings: 分阶段耗时字典，填入 save_structure_res 和 html_write 耗时
+
+        Returns:
+            是否保存成功
         """
         if results is None or len(results) == 0:
-            return
+            return False
 
         try:
-            # 获取文件名（不含扩展名）
+            # 结果名（子目录中的图片包含相对目录）和文件名（不含扩展名）
+            output_name = self.output_name(image_path)
             image_name = Path(image_path).stem
 
             # 创建该图片的输出目录
-            image_output_dir = os.path.join(self.output_dir, image_name)
+            image_output_dir = os.path.join(self.output_dir, output_name)
             os.makedirs(image_output_dir, exist_ok=True)
 
             # 使用 PaddleOCR 的保存函数
-            save_structure_res(results, image_output_dir, image_name)
+            start = time.perf_counter()
+            _paddleocr().save_structure_res(results, image_output_dir, image_name)
+            html_start = time.perf_counter()
 
             # 额外保存 HTML 文件（带样式）
             table_idx = 0
+            table_records = []
             for item in results:
                 if item.get('type') == 'table':
                     html_content = item.get('res', {}).get('html', '')
@@ -176,112 +1001,1493 @@ class BatchTableRecognizer:
                             f.write(html_content)
                             f.write('\n</body>\n</html>')
                         print(f"    ✓ HTML: {html_file}")
+                        if self.table_records is not None:
+                            rows, spans = parse_table(html_content)
+                            bbox = item.get('bbox')
+                            table_records.append({
+                                'index': table_idx,
+                                'bbox': [int(round(float(v))) for v in bbox] if bbox is not None else None,
+                                'rows': rows,
+                                'spans': spans
+                            })
                         table_idx += 1
 
+            if self.table_records is not None:
+                self.table_records.append(image_path, table_records, output_name)
+
+            if timings is not None:
+                timings['save_structure_res'] = html_start - start
+                timings['html_write'] = time.perf_counter() - html_start
+
             print(f"  ✓ 结果已保存到: {image_output_dir}/")
+            return True
 
         except Exception as e:
             print(f"  ✗ 保存结果失败: {str(e)}")
             import traceback
             traceback.print_exc()
+            return False
 
-    def batch_recognize(self, image_dir, image_pattern='*.jpg'):
+    def batch_recognize(self, image_dir, image_pattern='*.jpg', workers=1,
+                        prefetch=0, io_threads=None, async_write=False,
+                        write_queue_size=8, resume=False, recursive=False,
+                        count_total=False, timing_file=None,
+                        shard_dir=None, lease_ttl=600, node_id=None,
+                        image_timeout=0, max_memory_mb=0):
         """
         批量识别目录中的图片
 
         Args:
             image_dir: 图片目录
-            image_pattern: 图片文件匹配模式
+            image_pattern: 图片文件匹配模式（不区分大小写，jpg/jpeg/png 始终包含）
+            workers: 并行工作进程数，大于 1 时每个进程各自加载一个引擎
+            prefetch: 预读取队列深度，大于 0 时后台线程提前读取并解码图片（仅单进程模式）
+            io_threads: 预读取线程数（默认: min(prefetch, 4)）
+            async_write: 是否由后台线程写出结果，不阻塞下一张图片的推理（仅单进程模式）
+            write_queue_size: 后台写出队列长度，队列满时推理等待写出
+            resume: 是否跳过处理清单中已成功且未变化的图片（断点续跑）
+            recursive: 是否递归扫描子目录
+            count_total: 是否先扫描一遍统计图片总数，用于显示进度
+            timing_file: 分阶段耗时 JSONL 输出路径，指定后结束时打印 p50/p95/p99 汇总
+            shard_dir: 分片模式的共享租约目录，多个进程或主机指向同一目录时
+                       通过租约文件分配图片，各自只处理认领到的图片
+            lease_ttl: 分片模式的租约有效期（秒），超时未续期的租约由其他节点接管
+            node_id: 分片模式的节点名（默认: 主机名），同时决定本节点的处理清单文件名，
+                     重新运行时使用相同的节点名即可续跑；同一主机运行多个进程时需各自指定
+            image_timeout: 单张图片的超时（秒），0 表示不限制
+            max_memory_mb: 工作进程常驻内存上限（MB），0 表示不限制；
+                           两者任一启用时，图片在隔离的工作进程中处理（预读取和后台写出不生效），
+                           超限的进程被杀死并重启，该图片记为失败
 
         Returns:
             处理统计信息
         """
-        # 查找所有匹配的图片文件
-        image_paths = glob.glob(os.path.join(image_dir, image_pattern))
-
-        # 同时支持 JPG 和 PNG 等其他格式
-        for ext in ['*.jpeg', '*.png', '*.JPEG', '*.JPG', '*.PNG']:
-            image_paths.extend(glob.glob(os.path.join(image_dir, ext)))
-
-        # 去重并排序
-        image_paths = sorted(list(set(image_paths)))
+        # 子目录中的图片按相对路径保存结果，同名图片互不覆盖
+        self.image_root = image_dir
+        self._init_kwargs['image_root'] = image_dir
 
-        # 过滤掉非图片文件
-        image_paths = [p for p in image_paths if os.path.isfile(p)]
+        # 流式扫描目录：边发现边处理，第一张图片无需等待整个目录扫描完成
+        exclude_dirs = [self.output_dir]
+        if self.cache is not None:
+            exclude_dirs.append(self.cache.cache_dir)
+        image_paths = iter_image_files(image_dir, image_pattern, recursive, exclude_dirs)
 
-        total_images = len(image_paths)
+        # 可选：先快速计数一遍，用于显示进度
+        known_total = None
         print("\n" + "=" * 80)
-        print(f"找到 {total_images} 张图片")
+        if count_total:
+            known_total = sum(1 for _ in iter_image_files(image_dir, image_pattern,
+                                                          recursive, exclude_dirs))
+            print(f"找到 {known_total} 张图片")
+        else:
+            print(f"扫描目录: {os.path.abspath(image_dir)}（边扫描边处理）")
         print("=" * 80)
 
-        if total_images == 0:
-            print("未找到图片文件！")
-            return {
-                'total': 0,
-                'success': 0,
-                'fail': 0,
-                'elapsed_time': 0
-            }
+        # 分片模式：通过共享目录中的租约文件与其他节点分配图片
+        leases = None
+        if shard_dir:
+            leases = WorkLeases(shard_dir, image_dir, node_id, lease_ttl)
+            print(f"分片模式: 节点 {leases.node_id}，租约目录 {os.path.abspath(shard_dir)}")
+
+        # 处理清单：记录每张图片的处理结果，用于中断后续跑
+        if leases is not None:
+            manifest = ProcessingManifest(self.output_dir, f".manifest.{leases.node_id}.jsonl")
+        else:
+            manifest = ProcessingManifest(self.output_dir)
+        skipped_count = 0
+        if resume:
+            def pending_paths(paths):
+                nonlocal skipped_count
+                for image_path in paths:
+                    if manifest.is_completed(image_path):
+                        skipped_count += 1
+                    else:
+                        yield image_path
+
+            image_paths = pending_paths(image_paths)
 
-        print("\n开始批量处理...\n")
+        if leases is not None:
+            image_paths = (image_path for image_path in image_paths if leases.claim(image_path))
+
+        timer = StageTimer(timing_file) if timing_file else None
+
+        def finish(image_path, ok, timings=None):
+            """一张图片处理结束：记入清单和耗时统计"""
+            manifest.record(image_path, ok)
+            if leases is not None:
+                leases.complete(image_path, ok)
+            if timer is not None and timings:
+                timer.record(image_path, ok, timings)
 
         # 统计信息
         success_count = 0
         fail_count = 0
-        start_time = datetime.now()
+        write_fail_count = 0
+        cache_hit_count = 0
+        cache_miss_count = 0
+
+        # 隔离模式：单张图片超时或内存超限时只杀死对应的工作进程
+        isolated = bool(image_timeout or max_memory_mb)
+        isolation_killed = []
+
+        try:
+            # 先取出最多 workers 张待处理图片：没有图片时不必启动处理流程，也不必加载模型；
+            # 图片少于进程数时只启动需要的进程（每个进程都要加载一份模型）
+            head_paths = list(itertools.islice(image_paths, max(1, workers)))
+            if not head_paths:
+                workers = 1
+                isolated = False
+                image_paths = iter(())
+            else:
+                image_paths = itertools.chain(head_paths, image_paths)
+                workers = min(workers, len(head_paths))
+                if workers <= 1 and not isolated:
+                    # 单进程模式在计时开始前加载模型；多进程模式由各工作进程加载
+                    self.get_engine(self.lang)
+                print("\n开始批量处理...\n")
+            start_time = datetime.now()
+
+            if self.low_memory:
+                # 低内存模式：限制预读取和待写出的图片数
+                prefetch = min(prefetch, LOW_MEMORY_IN_FLIGHT)
+                write_queue_size = min(write_queue_size, LOW_MEMORY_IN_FLIGHT)
+                print(f"低内存模式: 每个阶段最多 {LOW_MEMORY_IN_FLIGHT} 张图片在途")
+
+            if workers > 1 or isolated:
+                # 多进程处理：每个进程初始化一次引擎，通过任务队列分发图片
+                print(f"使用 {workers} 个工作进程\n")
 
-        # 逐个处理图片
-        for idx, image_path in enumerate(image_paths, 1):
-            print(f"\n[{idx}/{total_images}] " + "-" * 60)
+                in_flight = None
+                if self.low_memory or leases is not None:
+                    # Pool 会一次性取走全部任务，低内存模式下按完成数逐个放行；
+                    # 分片模式下同样限制，避免一次认领全部图片
+                    in_flight = threading.Semaphore(workers * LOW_MEMORY_IN_FLIGHT)
+                    image_paths = _throttled(image_paths, in_flight)
 
-            results = self.recognize_single_image(image_path)
+                init_kwargs = self.worker_init_kwargs(workers)
+                if not self.use_gpu:
+                    print(f"每个工作进程 CPU 线程: {init_kwargs['cpu_threads']}")
 
-            if results is not None and len(results) > 0:
-                self.save_results(image_path, results)
-                success_count += 1
+                if isolated:
+                    limits = []
+                    if image_timeout:
+                        limits.append(f"单张超时 {image_timeout:g} 秒")
+                    if max_memory_mb:
+                        limits.append(f"工作进程内存上限 {max_memory_mb} MB")
+                    print(f"隔离模式: {'，'.join(limits)}，超限时重启工作进程并记为失败\n")
+                    pool = IsolatedPool(workers, init_kwargs, image_timeout, max_memory_mb)
+                    results_iter = pool.imap_unordered(image_paths)
+                    isolation_killed = pool.killed
+                else:
+                    ctx = multiprocessing.get_context('spawn')
+                    pool = ctx.Pool(processes=workers,
+                                    initializer=_init_worker,
+                                    initargs=(init_kwargs,))
+                    results_iter = pool.imap_unordered(_process_image_in_worker, image_paths)
+
+                with pool:
+                    try:
+                        for idx, (image_path, ok, cache_hit, cache_miss, timings) in enumerate(results_iter, 1):
+                            if in_flight is not None:
+                                in_flight.release()
+                            cache_hit_count += cache_hit
+                            cache_miss_count += cache_miss
+                            status = "✓" if ok else "✗"
+                            print(f"[{_progress(idx, known_total)}] {status} {Path(image_path).name}")
+                            finish(image_path, ok, timings)
+                            if ok:
+                                success_count += 1
+                            else:
+                                fail_count += 1
+                    except WorkerInitError as e:
+                        print(f"\n✗ {e}，批处理中止")
+                        raise
             else:
-                fail_count += 1
+                if prefetch > 0:
+                    print(f"预读取队列深度: {prefetch}\n")
+                    images = self.iter_prefetched_images(image_paths, prefetch, io_threads)
+                else:
+                    images = ((image_path, None, {}) for image_path in image_paths)
+
+                writer = None
+                if async_write:
+                    # 异步写出时，成功的图片在写出完成后才记入清单
+                    writer = ResultWriter(self, write_queue_size, on_done=finish)
+
+                cache_hits_before, cache_misses_before = self._cache_counts()
+
+                try:
+                    # 逐个处理图片
+                    for idx, (image_path, preloaded, timings) in enumerate(images, 1):
+                        print(f"\n[{_progress(idx, known_total)}] " + "-" * 60)
+
+                        ok = self._process_image(image_path, preloaded, writer, timings)
+                        if writer is None or not ok:
+                            finish(image_path, ok, timings)
+                        if ok:
+                            success_count += 1
+                        else:
+                            fail_count += 1
+                finally:
+                    if writer is not None:
+                        # 等待所有结果写出完成，写出失败的图片计入失败
+                        print("\n等待后台写出完成...")
+                        failed_writes = writer.close()
+                        write_fail_count = len(failed_writes)
+                        success_count -= write_fail_count
+                        fail_count += write_fail_count
+
+                cache_hits_after, cache_misses_after = self._cache_counts()
+                cache_hit_count = cache_hits_after - cache_hits_before
+                cache_miss_count = cache_misses_after - cache_misses_before
+        finally:
+            # 正常结束、中断（Ctrl-C）或出错时都释放尚未完成的租约，其他节点无需等待租约过期
+            if leases is not None:
+                leases.close()
+            if timer is not None:
+                timer.close()
 
         # 计算耗时
         end_time = datetime.now()
         elapsed_time = (end_time - start_time).total_seconds()
+        peak_rss_mb, peak_rss_workers_mb = peak_rss()
+
+        shard_skipped_count = leases.skipped if leases is not None else 0
+
+        processed_images = success_count + fail_count
+        total_images = processed_images + skipped_count + shard_skipped_count
+        if total_images == 0:
+            print("未找到图片文件！")
+        elif processed_images == 0 and skipped_count > 0:
+            print(f"\n断点续跑: {skipped_count} 张图片均已处理完成")
 
         # 打印统计信息
         print("\n" + "=" * 80)
         print("批量处理完成！")
         print("=" * 80)
         print(f"总图片数: {total_images}")
+        if skipped_count > 0:
+            print(f"跳过（已完成）: {skipped_count}")
+        if shard_skipped_count > 0:
+            print(f"跳过（其他节点处理中或已完成）: {shard_skipped_count}")
         print(f"成功: {success_count}")
         print(f"失败: {fail_count}")
+        if write_fail_count > 0:
+            print(f"  其中写出失败: {write_fail_count}")
+        if isolation_killed:
+            print(f"  其中超时、内存超限或工作进程不可用: {len(isolation_killed)}")
+            for image_path, reason in isolation_killed:
+                print(f"    {Path(image_path).name}: {reason}")
+        if self.cache is not None:
+            print(f"缓存命中: {cache_hit_count}，未命中: {cache_miss_count}")
         print(f"总耗时: {elapsed_time:.2f} 秒")
-        if total_images > 0:
-            print(f"平均每张: {elapsed_time/total_images:.2f} 秒")
+        if processed_images > 0:
+            print(f"平均每张: {elapsed_time/processed_images:.2f} 秒")
+        if peak_rss_mb is not None:
+            print(f"内存峰值: {peak_rss_mb:.0f} MB", end='')
+            if (workers > 1 or isolated) and peak_rss_workers_mb:
+                print(f"（工作进程最大 {peak_rss_workers_mb:.0f} MB）", end='')
+            print()
         print(f"结果保存在: {os.path.abspath(self.output_dir)}")
         print("=" * 80)
 
-        return {
+        stats = {
             'total': total_images,
             'success': success_count,
             'fail': fail_count,
-            'elapsed_time': elapsed_time
+            'skipped': skipped_count,
+            'shard_skipped': shard_skipped_count,
+            'write_fail': write_fail_count,
+            'killed': [{'path': image_path, 'reason': reason}
+                       for image_path, reason in isolation_killed],
+            'cache_hit': cache_hit_count,
+            'cache_miss': cache_miss_count,
+            'elapsed_time': elapsed_time,
+            'peak_rss_mb': peak_rss_mb,
+            'peak_rss_workers_mb': peak_rss_workers_mb if workers > 1 or isolated else None
         }
 
+        if timer is not None:
+            timer.print_summary()
+            stats['timing'] = timer.summary()
 
-def main():
-    """主函数"""
-    parser = argparse.ArgumentParser(
-        description='批量表格识别工具 - 基于 PaddleOCR PPStructure',
-        formatter_class=argparse.RawDescriptionHelpFormatter,
-        epilog="""
-示例用法:
-  # 使用 GPU 识别当前目录所有图片
-  python batch_table_recognition.py --device gpu
+        if leases is not None:
+            # 写出本节点统计，并汇总目前所有节点的结果
+            leases.write_stats(stats)
+            stats['shard'] = WorkLeases.merged_report(shard_dir, lease_ttl)
+            WorkLeases.print_report(stats['shard'])
 
-  # 指定图片目录和输出目录
-  python batch_table_recognition.py --device gpu --image_dir ./images --output_dir ./results
+        return stats
 
-  # 使用 CPU
-  python batch_table_recognition.py --device cpu
+    def _cache_counts(self):
+        """返回缓存的累计 (命中数, 未命中数)"""
+        if self.cache is None:
+            return 0, 0
+        return self.cache.hits, self.cache.misses
+
+    def _process_image(self, image_path, preloaded=None, writer=None, timings=None):
+        """
+        识别并保存单张图片
+
+        Args:
+            image_path: 图片路径
+            preloaded: 预先读取的 (图片数组, 错误信息, 坐标变换)
+            writer: 后台写出器，为 None 时同步保存
+            timings: 分阶段耗时字典
+
+        Returns:
+            是否识别成功（异步写出时，写出失败在 writer.close() 时汇报）
+        """
+        start = time.perf_counter()
+        results = self.recognize_single_image(image_path, preloaded, timings)
+
+        if results is None or len(results) == 0:
+            ok = False
+        elif writer is not None:
+            writer.submit(image_path, results, timings)
+            ok = True
+        else:
+            ok = self.save_results(image_path, results, timings)
+
+        if timings is not None:
+            timings['total'] = time.perf_counter() - start
+        return ok
+
+
+class ResultWriter:
+    """后台结果写出器，在独立线程中调用 save_results"""
+
+    def __init__(self, recognizer, queue_size=8, on_done=None):
+        """
+        初始化后台写出器
+
+        Args:
+            recognizer: 提供 save_results 的识别器
+            queue_size: 待写出队列长度，队列满时 submit 阻塞（背压）
+            on_done: 每张图片写出后的回调 on_done(图片路径, 是否成功, 分阶段耗时)
+        """
+        self.recognizer = recognizer
+        self.on_done = on_done
+        self.queue = queue.Queue(maxsize=max(1, queue_size))
+        self.failed = []
+        self._thread = threading.Thread(target=self._run, name='ResultWriter', daemon=True)
+        self._thread.start()
+
+    def submit(self, image_path, results, timings=None):
+        """提交一张图片的识别结果，队列满时等待"""
+        self.queue.put((image_path, results, timings))
+
+    def close(self):
+        """
+        等待队列中的结果全部写出并停止线程
+
+        Returns:
+            写出失败的图片路径列表
+        """
+        self.queue.put(None)
+        self._thread.join()
+        return self.failed
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            image_path, results, timings = item
+            try:
+                ok = self.recognizer.save_results(image_path, results, timings)
+            except Exception as e:
+                print(f"  ✗ 后台写出失败 {Path(image_path).name}: {str(e)}")
+                ok = False
+            if not ok:
+                self.failed.append(image_path)
+            if self.on_done is not None:
+                self.on_done(image_path, ok, timings)
+
+
+class ProcessingManifest:
+    """
+    处理清单：输出目录下的追加式 JSONL 文件
+
+    每处理完一张图片追加一条记录（路径、大小、修改时间、状态），
+    同一路径以最后一条记录为准。程序中断后重新运行时，
+    已成功且大小、修改时间均未变化的图片可以直接跳过。
+    记录时不计算内容哈希，避免每张图片在推理之外再完整读取一遍。
+    """
+
+    FILE_NAME = '.manifest.jsonl'
+
+    def __init__(self, output_dir, file_name=FILE_NAME):
+        """
+        加载（或创建）处理清单
+
+        Args:
+            output_dir: 输出目录
+            file_name: 清单文件名（分片模式下每个节点使用各自的清单，避免多台主机追加同一文件）
+        """
+        self.path = os.path.join(output_dir, file_name)
+        self.records = {}
+        self._lock = threading.Lock()
+
+        if os.path.exists(self.path):
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # 进程被杀死时最后一行可能不完整，忽略即可
+                        continue
+                    self.records[record['path']] = record
+
+    @staticmethod
+    def file_signature(image_path):
+        """
+        文件签名（只 stat，不读取文件内容）
+
+        Returns:
+            {'size', 'mtime'}
+        """
+        st = os.stat(image_path)
+        return {'size': st.st_size, 'mtime': st.st_mtime}
+
+    def is_completed(self, image_path):
+        """
+        判断图片是否已成功处理且内容未变化
+
+        大小和修改时间都一致时认为未变化，否则重新处理。
+        """
+        record = self.records.get(os.path.abspath(image_path))
+        if record is None or record.get('status') != 'success':
+            return False
+
+        try:
+            st = os.stat(image_path)
+            return st.st_size == record['size'] and st.st_mtime == record['mtime']
+        except OSError:
+            return False
+
+    def record(self, image_path, ok):
+        """
+        追加一条处理记录
+
+        Args:
+            image_path: 图片路径
+            ok: 是否处理成功
+        """
+        record = {'path': os.path.abspath(image_path)}
+        try:
+            record.update(self.file_signature(image_path))
+        except OSError:
+            record.update({'size': None, 'mtime': None})
+        record['status'] = 'success' if ok else 'fail'
+        record['time'] = datetime.now().isoformat(timespec='seconds')
+
+        with self._lock:
+            self.records[record['path']] = record
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+
+class TableRecordLog:
+    """
+    表格记录旁路文件：每张图片一行 JSON，包含各表格的单元格文本和合并单元格
+
+    保存结果时顺带写出，merge_results.py --from_records 直接读取，
+    省去写出 HTML 后再读取、解析的往返。每个进程写各自的文件
+    （output_dir/.tables/<主机名>-<进程号>.jsonl），多进程和分片模式下互不干扰；
+    同一张图片以最后写入的记录为准。
+    """
+
+    DIR_NAME = '.tables'
+
+    def __init__(self, output_dir):
+        """
+        Args:
+            output_dir: 输出目录
+        """
+        self.record_dir = os.path.join(output_dir, self.DIR_NAME)
+        self._file = None
+        self._lock = threading.Lock()
+
+    def append(self, image_path, tables, image_name=None):
+        """
+        追加一张图片的表格记录
+
+        Args:
+            image_path: 图片路径
+            tables: [{'index', 'bbox', 'rows', 'spans'}, ...]，index 与 HTML 文件序号一致
+            image_name: 结果名（BatchTableRecognizer.output_name），默认为不含扩展名的文件名
+        """
+        record = {
+            'image': image_name or Path(image_path).stem,
+            'source': os.path.abspath(image_path),
+            'time': datetime.now().isoformat(timespec='seconds'),
+            'tables': tables
+        }
+        line = json.dumps(record, ensure_ascii=False) + '\n'
+        with self._lock:
+            if self._file is None:
+                os.makedirs(self.record_dir, exist_ok=True)
+                file_name = f"{socket.gethostname()}-{os.getpid()}.jsonl"
+                self._file = open(os.path.join(self.record_dir, file_name), 'a', encoding='utf-8')
+            self._file.write(line)
+            self._file.flush()
+
+    @classmethod
+    def load(cls, output_dir):
+        """
+        读取输出目录中的全部表格记录
+
+        Args:
+            output_dir: 输出目录
+
+        Returns:
+            {结果名: 记录}，按文件修改时间先后读取，后写入的记录覆盖先写入的
+        """
+        record_dir = os.path.join(output_dir, cls.DIR_NAME)
+        records = {}
+        if not os.path.isdir(record_dir):
+            return records
+
+        paths = [os.path.join(record_dir, name) for name in os.listdir(record_dir)
+                 if name.endswith('.jsonl')]
+        for path in sorted(paths, key=os.path.getmtime):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # 进程被杀死时最后一行可能不完整
+                        continue
+                    records[record['image']] = record
+        return records
+
+
+class WorkLeases:
+    """
+    分片模式的工作租约：多个进程或主机通过共享目录分配图片，不需要额外的消息队列
+
+    每张图片对应租约目录下的两个文件（文件名为图片相对路径的哈希）：
+      <hash>.lease  正在处理，以 O_CREAT | O_EXCL 原子创建，创建成功者获得该图片
+      <hash>.done   已处理完成（含成功/失败状态），先写临时文件再原子改名
+
+    持有者的心跳线程定期更新 .lease 的修改时间。超过 ttl 未更新的租约视为持有者已崩溃，
+    其他节点先把它原子改名（只有一个节点能成功），确认改名的正是判定过期的那份租约
+    （租约中的随机令牌和修改时间均未变化）后再重新认领；否则放回原处并放弃。
+    lease_ttl 应远大于各主机之间的时钟偏差。
+
+    每个节点结束时把自己的统计写入 stats/<节点名>.json，用于汇总报告。
+    """
+
+    def __init__(self, lease_dir, image_dir, node_id=None, ttl=600):
+        """
+        初始化租约目录
+
+        Args:
+            lease_dir: 共享的租约目录（所有节点须指向同一目录）
+            image_dir: 图片目录，租约按相对该目录的路径标识图片，各主机挂载位置可以不同
+            node_id: 节点名，默认 主机名（进程号只记录在租约内容中）
+            ttl: 租约有效期（秒）
+        """
+        self.lease_dir = lease_dir
+        self.image_dir = image_dir
+        self.node_id = node_id or socket.gethostname()
+        self.ttl = ttl
+        self.skipped = 0
+        self.reclaimed = 0
+        self._held = {}
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(lease_dir, 'stats'), exist_ok=True)
+
+        self._stop = threading.Event()
+        self._heartbeat = threading.Thread(target=self._renew_loop, daemon=True)
+        self._heartbeat.start()
+
+    def _base(self, image_path):
+        """图片对应的租约文件路径前缀，以及相对路径"""
+        rel_path = os.path.relpath(image_path, self.image_dir).replace(os.sep, '/')
+        key = hashlib.sha1(rel_path.encode('utf-8')).hexdigest()
+        return os.path.join(self.lease_dir, key), rel_path
+
+    def _create_lease(self, base, rel_path):
+        """原子创建租约文件，已存在时返回 False"""
+        try:
+            fd = os.open(base + '.lease', os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump({'path': rel_path, 'node': self.node_id, 'pid': os.getpid(),
+                       'token': uuid.uuid4().hex,
+                       'time': datetime.now().isoformat(timespec='seconds')}, f, ensure_ascii=False)
+        return True
+
+    @staticmethod
+    def _lease_state(lease_path):
+        """
+        租约的标识
+
+        Returns:
+            (令牌, 修改时间)；租约不存在时为 None，内容不完整时令牌为 None
+        """
+        try:
+            mtime = os.stat(lease_path).st_mtime
+            with open(lease_path, 'r', encoding='utf-8') as f:
+                token = json.load(f).get('token', '')
+        except FileNotFoundError:
+            return None
+        except ValueError:
+            token = None
+        return token, mtime
+
+    def claim(self, image_path):
+        """
+        认领一张图片
+
+        Returns:
+            是否认领成功；已完成或由其他节点持有时返回 False
+        """
+        base, rel_path = self._base(image_path)
+        if os.path.exists(base + '.done'):
+            self.skipped += 1
+            return False
+
+        if not self._create_lease(base, rel_path):
+            observed = self._lease_state(base + '.lease')
+            if observed is None or time.time() - observed[1] <= self.ttl:
+                self.skipped += 1
+                return False
+            # 接管过期租约：改名是原子的，多个节点同时接管时只有一个成功
+            stale = f"{base}.lease.{self.node_id}.{os.getpid()}.stale"
+            try:
+                os.rename(base + '.lease', stale)
+            except OSError:
+                self.skipped += 1
+                return False
+            if self._lease_state(stale) != observed:
+                # 判定过期之后，租约已被续期或被其他节点接管并重新创建：放回原处并放弃
+                try:
+                    os.link(stale, base + '.lease')
+                except OSError:
+                    pass
+                try:
+                    os.remove(stale)
+                except OSError:
+                    pass
+                self.skipped += 1
+                return False
+            os.remove(stale)
+            if not self._create_lease(base, rel_path):
+                self.skipped += 1
+                return False
+            self.reclaimed += 1
+            print(f"接管过期租约: {rel_path}")
+
+        # 检查与创建之间其他节点可能刚好完成该图片
+        if os.path.exists(base + '.done'):
+            os.remove(base + '.lease')
+            self.skipped += 1
+            return False
+
+        with self._lock:
+            self._held[image_path] = base
+        return True
+
+    def complete(self, image_path, ok):
+        """
+        标记图片处理完成并释放租约
+
+        Args:
+            image_path: 图片路径
+            ok: 是否处理成功
+        """
+        with self._lock:
+            base = self._held.pop(image_path, None)
+        if base is None:
+            return
+
+        _, rel_path = self._base(image_path)
+        record = {'path': rel_path, 'node': self.node_id, 'status': 'success' if ok else 'fail',
+                  'time': datetime.now().isoformat(timespec='seconds')}
+        tmp_path = f"{base}.done.{self.node_id}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(record, f, ensure_ascii=False)
+        os.replace(tmp_path, base + '.done')
+        try:
+            os.remove(base + '.lease')
+        except OSError:
+            pass
+
+    def _renew_loop(self):
+        """心跳：定期更新持有租约的修改时间"""
+        while not self._stop.wait(max(1.0, self.ttl / 3.0)):
+            with self._lock:
+                held = list(self._held.values())
+            for base in held:
+                try:
+                    os.utime(base + '.lease')
+                except OSError:
+                    print(f"⚠ 租约续期失败: {base}.lease")
+
+    def close(self):
+        """停止心跳，释放尚未完成的租约（中断时让其他节点立即接手）"""
+        self._stop.set()
+        self._heartbeat.join()
+        with self._lock:
+            held, self._held = list(self._held.values()), {}
+        for base in held:
+            try:
+                os.remove(base + '.lease')
+            except OSError:
+                pass
+
+    def write_stats(self, stats):
+        """写出本节点的统计信息"""
+        stats_path = os.path.join(self.lease_dir, 'stats', f"{self.node_id}.json")
+        tmp_path = stats_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(dict(stats, node=self.node_id), f, ensure_ascii=False, default=str)
+        os.replace(tmp_path, stats_path)
+
+    @staticmethod
+    def merged_report(lease_dir, ttl=600):
+        """
+        汇总所有节点的统计和租约目录的状态
+
+        Args:
+            lease_dir: 租约目录
+            ttl: 租约有效期（秒），用于区分正在处理和已过期的租约
+
+        Returns:
+            {'nodes', 'success', 'fail', 'write_fail', 'elapsed_time',
+             'done_success', 'done_fail', 'leased', 'expired'}
+        """
+        report = {'nodes': [], 'success': 0, 'fail': 0, 'write_fail': 0, 'elapsed_time': 0.0,
+                  'done_success': 0, 'done_fail': 0, 'leased': 0, 'expired': 0}
+
+        stats_dir = os.path.join(lease_dir, 'stats')
+        if os.path.isdir(stats_dir):
+            for name in sorted(os.listdir(stats_dir)):
+                if not name.endswith('.json'):
+                    continue
+                try:
+                    with open(os.path.join(stats_dir, name), 'r', encoding='utf-8') as f:
+                        node_stats = json.load(f)
+                except (OSError, ValueError):
+                    continue
+                report['nodes'].append({key: node_stats.get(key) for key in
+                                        ('node', 'success', 'fail', 'elapsed_time')})
+                for key in ('success', 'fail', 'write_fail'):
+                    report[key] += node_stats.get(key) or 0
+                report['elapsed_time'] = max(report['elapsed_time'],
+                                             node_stats.get('elapsed_time') or 0.0)
+
+        now = time.time()
+        with os.scandir(lease_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith('.done'):
+                    try:
+                        with open(entry.path, 'r', encoding='utf-8') as f:
+                            status = json.load(f).get('status')
+                    except (OSError, ValueError):
+                        continue
+                    report['done_success' if status == 'success' else 'done_fail'] += 1
+                elif entry.name.endswith('.lease'):
+                    try:
+                        expired = now - entry.stat().st_mtime > ttl
+                    except OSError:
+                        continue
+                    report['expired' if expired else 'leased'] += 1
+        return report
+
+    @staticmethod
+    def print_report(report):
+        """打印分片汇总报告"""
+        print("\n" + "=" * 80)
+        print("分片汇总（所有节点）")
+        print("=" * 80)
+        for node in report['nodes']:
+            print(f"  {node['node']}: 成功 {node['success']}，失败 {node['fail']}，"
+                  f"耗时 {node['elapsed_time'] or 0:.2f} 秒")
+        print(f"节点数: {len(report['nodes'])}")
+        print(f"已完成: {report['done_success'] + report['done_fail']}"
+              f"（成功 {report['done_success']}，失败 {report['done_fail']}）")
+        if report['leased'] or report['expired']:
+            print(f"处理中: {report['leased']}，租约已过期: {report['expired']}")
+        print(f"最长节点耗时: {report['elapsed_time']:.2f} 秒")
+        print("=" * 80)
+
+
+class StageTimer:
+    """
+    分阶段耗时统计
+
+    每张图片的各阶段耗时（秒）追加写入 JSONL 文件，
+    批处理结束后按阶段汇总 p50/p95/p99。
+    """
+
+    STAGES = ('read', 'decode', 'preprocess', 'layout', 'table', 'ocr', 'inference',
+              'save_structure_res', 'html_write', 'total')
+
+    def __init__(self, timing_file=None):
+        """
+        初始化耗时统计
+
+        Args:
+            timing_file: JSONL 输出路径，为 None 时只在内存中汇总
+        """
+        self.timing_file = timing_file
+        self.samples = {stage: [] for stage in self.STAGES}
+        self._lock = threading.Lock()
+        self._file = None
+        if timing_file:
+            timing_dir = os.path.dirname(os.path.abspath(timing_file))
+            os.makedirs(timing_dir, exist_ok=True)
+            self._file = open(timing_file, 'a', encoding='utf-8')
+
+    def record(self, image_path, ok, timings):
+        """
+        记录一张图片的分阶段耗时
+
+        Args:
+            image_path: 图片路径
+            ok: 是否处理成功
+            timings: {阶段: 秒}
+        """
+        with self._lock:
+            for stage, seconds in timings.items():
+                self.samples.setdefault(stage, []).append(seconds)
+            if self._file is not None:
+                record = {'path': image_path, 'status': 'success' if ok else 'fail'}
+                record.update({stage: round(seconds, 6) for stage, seconds in timings.items()})
+                self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    @staticmethod
+    def _percentile(ordered, pct):
+        """最近秩法百分位数，ordered 须已排序"""
+        rank = int(math.ceil(pct / 100.0 * len(ordered))) - 1
+        return ordered[max(0, min(rank, len(ordered) - 1))]
+
+    def summary(self):
+        """
+        按阶段汇总
+
+        Returns:
+            {阶段: {'count', 'mean', 'p50', 'p95', 'p99'}}，没有样本的阶段不包含
+        """
+        with self._lock:
+            result = {}
+            for stage, values in self.samples.items():
+                if not values:
+                    continue
+                ordered = sorted(values)
+                result[stage] = {
+                    'count': len(ordered),
+                    'mean': sum(ordered) / len(ordered),
+                    'p50': self._percentile(ordered, 50),
+                    'p95': self._percentile(ordered, 95),
+                    'p99': self._percentile(ordered, 99)
+                }
+            return result
+
+    def print_summary(self):
+        """打印分阶段耗时汇总（毫秒）"""
+        summary = self.summary()
+        print("\n分阶段耗时（毫秒）:")
+        print(f"  {'阶段':<20}{'次数':>8}{'平均':>10}{'p50':>10}{'p95':>10}{'p99':>10}")
+        for stage, values in summary.items():
+            print(f"  {stage:<20}{values['count']:>8}"
+                  f"{values['mean'] * 1000:>10.1f}{values['p50'] * 1000:>10.1f}"
+                  f"{values['p95'] * 1000:>10.1f}{values['p99'] * 1000:>10.1f}")
+        if self.timing_file:
+            print(f"  明细: {self.timing_file}")
+
+    def close(self):
+        """关闭 JSONL 文件"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class ResultCache:
+    """
+    按图片内容哈希缓存 PPStructure 识别结果的磁盘缓存
+
+    每个结果以 pickle 文件保存在缓存目录中，总大小超过上限时
+    淘汰最近最少使用的条目（以文件修改时间记录使用时间，跨运行保留）。
+    多个进程可共享同一缓存目录：写入使用临时文件 + 原子替换。
+    容量上限针对整个缓存目录：每个进程定期重新扫描目录，计入其他进程写入的条目，
+    因此多个工作进程共享时总大小也不会成倍增长。超限时一次淘汰到上限的 LOW_WATER 比例，
+    之后的写入不必每次都淘汰。
+    缓存的结果不含区域裁剪图（图片区域除外，见 strip_image_crops），
+    生成 HTML 和 Excel 只需要识别出的结构和文本。
+    """
+
+    # 每写入多少条重新扫描一次缓存目录
+    RESCAN_INTERVAL = 32
+    # 超限时淘汰到容量上限的该比例
+    LOW_WATER = 0.9
+
+    def __init__(self, cache_dir, max_size_mb=1024, use_phash=False,
+                 phash_size=32, namespace=''):
+        """
+        初始化缓存
+
+        Args:
+            cache_dir: 缓存目录
+            max_size_mb: 缓存容量上限（MB）
+            use_phash: 是否使用感知哈希（差值哈希）作为缓存键
+            phash_size: 感知哈希的网格边长，越大越不容易把不同表格误判为相同
+            namespace: 缓存键前缀（如语言），用于隔离不同配置的结果
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = int(max_size_mb * 1024 * 1024)
+        self.use_phash = use_phash
+        self.phash_size = phash_size
+        self.namespace = namespace
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._puts_since_scan = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        self._rescan()
+
+    def _rescan(self):
+        """从缓存目录重建索引：按最近使用时间从旧到新排列的 {键: 文件大小}"""
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith('.pkl') and entry.is_file():
+                try:
+                    st = entry.stat()
+                except OSError:
+                    # 其他进程刚刚淘汰了该条目
+                    continue
+                entries.append((st.st_mtime, entry.name[:-4], st.st_size))
+        entries.sort()
+        self._index = OrderedDict((key, size) for _, key, size in entries)
+        self._total_bytes = sum(self._index.values())
+        self._puts_since_scan = 0
+
+    def __len__(self):
+        return len(self._index)
+
+    def make_key(self, img, namespace=None):
+        """
+        计算解码后图片的缓存键
+
+        默认使用像素内容的 SHA1（字节完全相同的重复图片命中）；
+        启用感知哈希时使用差值哈希，重新压缩保存的图片也能命中。
+
+        Args:
+            img: 图片数组
+            namespace: 缓存键前缀，默认使用初始化时的 namespace
+        """
+        import cv2
+
+        h, w = img.shape[:2]
+        if self.use_phash:
+            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+            small = cv2.resize(gray, (self.phash_size + 1, self.phash_size),
+                               interpolation=cv2.INTER_AREA)
+            bits = (small[:, 1:] > small[:, :-1]).flatten()
+            digest = hashlib.sha1(bits.tobytes()).hexdigest()
+            kind = 'p'
+        else:
+            digest = hashlib.sha1(img.tobytes()).hexdigest()
+            kind = 'c'
+        return f"{namespace or self.namespace}_{kind}_{w}x{h}_{digest}"
+
+    def _file(self, key):
+        return os.path.join(self.cache_dir, key + '.pkl')
+
+    def get(self, key):
+        """读取缓存结果，未命中时返回 None"""
+        try:
+            with open(self._file(key), 'rb') as f:
+                result = pickle.load(f)
+            # 更新修改时间，作为最近使用时间
+            os.utime(self._file(key))
+        except (OSError, EOFError, pickle.UnpicklingError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+            if key in self._index:
+                self._index.move_to_end(key)
+        return result
+
+    def put(self, key, result):
+        """写入缓存结果，必要时淘汰最久未使用的条目"""
+        path = self._file(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        # 裁剪图与原图像素量相当，不写入缓存（复制后丢弃，不修改调用方的结果）
+        result = strip_image_crops([dict(item) for item in result])
+        try:
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+                # 改名后文件可能立即被其他进程淘汰，在改名前取得大小
+                size = f.tell()
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"  ⚠ 写入缓存失败: {str(e)}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+
+        with self._lock:
+            self._total_bytes += size - self._index.pop(key, 0)
+            self._index[key] = size
+            self._puts_since_scan += 1
+            if self._puts_since_scan >= self.RESCAN_INTERVAL:
+                # 本地统计只包含本进程的写入，定期以目录中的实际内容为准
+                self._rescan()
+            if self._total_bytes <= self.max_bytes:
+                return
+            low_water = self.max_bytes * self.LOW_WATER
+            while self._total_bytes > low_water and len(self._index) > 1:
+                old_key, old_size = self._index.popitem(last=False)
+                self._total_bytes -= old_size
+                try:
+                    os.remove(self._file(old_key))
+                except OSError:
+                    pass
+
+
+# 多进程模式下每个工作进程持有的识别器
+_worker_recognizer = None
+
+
+# 工作进程初始化失败的原因，为 None 表示初始化成功
+_worker_init_error = None
+
+
+class WorkerInitError(RuntimeError):
+    """工作进程初始化（加载模型）失败"""
+
+
+def _init_worker(init_kwargs):
+    """
+    工作进程初始化：加载一次引擎，供该进程处理的所有图片复用
+
+    失败时不退出进程（否则 multiprocessing.Pool 会不断重启新的工作进程、批处理永远不结束），
+    只记录原因，由该进程收到的第一个任务把 WorkerInitError 交回父进程。
+    """
+    global _worker_recognizer, _worker_init_error
+    try:
+        _worker_recognizer = BatchTableRecognizer(**init_kwargs)
+        _worker_recognizer.get_engine(_worker_recognizer.lang)
+    except BaseException as e:
+        # 包括 _paddleocr() 导入失败时的 SystemExit
+        _worker_init_error = f"{type(e).__name__}: {e}"
+
+
+def _process_image_in_worker(image_path):
+    """
+    在工作进程中处理单张图片
+
+    Returns:
+        (图片路径, 是否成功, 缓存命中数, 缓存未命中数, 分阶段耗时)
+    """
+    if _worker_init_error is not None:
+        raise WorkerInitError(f"工作进程 {os.getpid()} 初始化失败（{_worker_init_error}）")
+    timings = {}
+    hits_before, misses_before = _worker_recognizer._cache_counts()
+    ok = _worker_recognizer._process_image(image_path, timings=timings)
+    hits_after, misses_after = _worker_recognizer._cache_counts()
+    return image_path, ok, hits_after - hits_before, misses_after - misses_before, timings
+
+
+def _isolated_worker_main(conn, init_kwargs):
+    """隔离工作进程的主循环：加载引擎后逐张处理父进程发来的图片"""
+    _init_worker(init_kwargs)
+    if _worker_init_error is not None:
+        # 不发送就绪信号直接退出，父进程在 _wait_ready 中得知初始化失败
+        return
+    conn.send('ready')
+    while True:
+        image_path = conn.recv()
+        if image_path is None:
+            break
+        conn.send(_process_image_in_worker(image_path))
+
+
+class IsolatedWorker:
+    """
+    在独立进程中处理图片，超时或内存超限时杀死并重启该进程
+
+    父进程等待结果期间每 POLL_INTERVAL 秒检查一次耗时和子进程常驻内存
+    （Linux 读取 /proc，其他平台需要 psutil，无法获取时只限制耗时）。
+    子进程崩溃（如解码损坏图片时段错误）同样会被重启，该图片记为失败。
+
+    内存上限是尽力而为的轮询检查，不是硬限制：两次检查之间的快速增长仍可能先触发
+    系统的 OOM killer（此时按子进程异常退出处理）。需要硬限制时应在外层使用
+    cgroup（如 systemd-run -p MemoryMax=、容器内存限制）。不使用 RLIMIT_AS，
+    因为推理框架预留的虚拟地址空间远大于实际占用的内存。
+    重启后无法重新初始化的进程被标记为不可用（failed），不再分配图片。
+    """
+
+    POLL_INTERVAL = 0.05
+
+    def __init__(self, init_kwargs, timeout=0, max_memory_mb=0):
+        """
+        启动工作进程（不等待模型加载完成）
+
+        Args:
+            init_kwargs: BatchTableRecognizer 初始化参数
+            timeout: 单张图片的超时（秒），0 表示不限制
+            max_memory_mb: 工作进程常驻内存上限（MB），0 表示不限制
+        """
+        self.init_kwargs = init_kwargs
+        self.timeout = timeout
+        self.max_memory_mb = max_memory_mb
+        self.restarts = 0
+        self._ctx = multiprocessing.get_context('spawn')
+        self._start()
+
+    def _start(self):
+        parent_conn, child_conn = self._ctx.Pipe()
+        self.process = self._ctx.Process(target=_isolated_worker_main,
+                                         args=(child_conn, self.init_kwargs), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.conn = parent_conn
+        self._ready = False
+        self.failed = None
+
+    def _wait_ready(self):
+        """等待模型加载完成（不计入单张图片的超时），失败时抛出 RuntimeError"""
+        if self._ready:
+            return
+        if self.failed:
+            raise RuntimeError(self.failed)
+        try:
+            self.conn.recv()
+        except EOFError:
+            self.process.join()
+            self.failed = f"工作进程初始化失败（退出码 {self.process.exitcode}）"
+            raise RuntimeError(self.failed)
+        self._ready = True
+
+    def _kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+    def process_image(self, image_path):
+        """
+        处理一张图片
+
+        Returns:
+            ((图片路径, 是否成功, 缓存命中数, 缓存未命中数, 分阶段耗时), 失败原因)，
+            正常返回时失败原因为 None；进程无法初始化时 failed 被设置
+        """
+        try:
+            self._wait_ready()
+        except RuntimeError as e:
+            return (image_path, False, 0, 0, {}), str(e)
+        self.conn.send(image_path)
+        start = time.monotonic()
+
+        while True:
+            if self.conn.poll(self.POLL_INTERVAL):
+                try:
+                    return self.conn.recv(), None
+                except EOFError:
+                    self.process.join()
+                    reason = f"工作进程异常退出（退出码 {self.process.exitcode}）"
+                    break
+            elapsed = time.monotonic() - start
+            if self.timeout and elapsed > self.timeout:
+                reason = f"超时（{self.timeout:g} 秒）"
+                break
+            if self.max_memory_mb:
+                rss = process_rss(self.process.pid)
+                if rss is not None and rss > self.max_memory_mb:
+                    reason = f"内存超限（{rss:.0f} MB > {self.max_memory_mb} MB）"
+                    break
+
+        self._kill()
+        self.restarts += 1
+        self._start()
+        return (image_path, False, 0, 0, {'total': time.monotonic() - start}), reason
+
+    def close(self):
+        """通知工作进程退出"""
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self._kill()
+
+
+class IsolatedPool:
+    """
+    隔离工作进程池：接口与 multiprocessing.Pool.imap_unordered 的用法一致，
+    每个工作进程由父进程中的一个线程驱动，单张图片超时或内存超限只影响该进程
+    """
+
+    def __init__(self, workers, init_kwargs, timeout=0, max_memory_mb=0):
+        """
+        Args:
+            workers: 工作进程数
+            init_kwargs: BatchTableRecognizer 初始化参数
+            timeout: 单张图片的超时（秒），0 表示不限制
+            max_memory_mb: 每个工作进程的常驻内存上限（MB），0 表示不限制
+        """
+        self.workers = [IsolatedWorker(init_kwargs, timeout, max_memory_mb)
+                        for _ in range(max(1, workers))]
+        self.killed = []
+
+    def wait_ready(self):
+        """等待所有工作进程加载完模型"""
+        for worker in self.workers:
+            worker._wait_ready()
+
+    def imap_unordered(self, image_paths):
+        """
+        按完成顺序产出处理结果
+
+        Yields:
+            (图片路径, 是否成功, 缓存命中数, 缓存未命中数, 分阶段耗时)
+        """
+        image_paths = iter(image_paths)
+        paths_lock = threading.Lock()
+        results = queue.Queue()
+
+        def fail_remaining(reason):
+            """所有工作进程都不可用：其余图片记为失败，批处理继续完成统计"""
+            with paths_lock:
+                for image_path in image_paths:
+                    self.killed.append((image_path, reason))
+                    results.put((image_path, False, 0, 0, {}))
+
+        def run(worker):
+            try:
+                while True:
+                    with paths_lock:
+                        image_path = next(image_paths, None)
+                    if image_path is None:
+                        break
+                    result, reason = worker.process_image(image_path)
+                    if reason is not None:
+                        if worker.failed:
+                            print(f"✗ {Path(image_path).name}: {reason}，该工作进程不再使用")
+                        else:
+                            print(f"✗ {Path(image_path).name}: {reason}，已重启工作进程")
+                        self.killed.append((image_path, reason))
+                    results.put(result)
+                    if worker.failed:
+                        if all(w.failed for w in self.workers):
+                            fail_remaining("没有可用的工作进程")
+                        break
+            except Exception as e:
+                results.put(e)
+            finally:
+                results.put(None)
+
+        threads = [threading.Thread(target=run, args=(worker,), daemon=True)
+                   for worker in self.workers]
+        for thread in threads:
+            thread.start()
+
+        running = len(threads)
+        while running:
+            item = results.get()
+            if item is None:
+                running -= 1
+            elif isinstance(item, Exception):
+                raise item
+            else:
+                yield item
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        for worker in self.workers:
+            worker.close()
+
+
+def calibrate_threads(recognizer_kwargs, image_dir, image_pattern='*.jpg',
+                      sample_size=16, recursive=False):
+    """
+    在本机上测量 CPU 推理的 工作进程数 × 线程数 组合（以及 MKLDNN 开关）的吞吐
+
+    工作进程数取 1、2、4…直到可用核数，每个进程的线程数为 可用核数 / 进程数。
+    每个组合启动新的工作进程（线程数环境变量在导入 paddle 前生效），
+    模型加载完成并预热后，计时处理同一批样本图片。
+
+    Args:
+        recognizer_kwargs: BatchTableRecognizer 初始化参数（输出目录、缓存和线程设置会被替换）
+        image_dir: 样本图片目录
+        image_pattern: 图片文件匹配模式
+        sample_size: 样本图片数
+        recursive: 是否递归扫描子目录
+
+    Returns:
+        按成功图片吞吐从高到低排序的结果（有失败的组合排在最后）
+        [{'workers', 'cpu_threads', 'enable_mkldnn', 'images_per_sec', 'fail', 'error'}]；
+        没有全部成功的组合时返回空列表
+    """
+    cpus = available_cpus()
+    sample = list(itertools.islice(iter_image_files(image_dir, image_pattern, recursive), sample_size))
+    if not sample:
+        print("未找到样本图片！")
+        return []
+
+    worker_counts = []
+    workers = 1
+    while workers < cpus:
+        worker_counts.append(workers)
+        workers *= 2
+    worker_counts.append(cpus)
+
+    print("=" * 80)
+    print(f"线程校准: 可用 {cpus} 核，样本 {len(sample)} 张图片")
+    print("=" * 80)
+
+    output_dir = tempfile.mkdtemp(prefix='calibrate_')
+    results = []
+    try:
+        for enable_mkldnn in (False, True):
+            for workers in worker_counts:
+                threads = max(1, cpus // workers)
+                init_kwargs = dict(recognizer_kwargs, output_dir=output_dir, use_gpu=False,
+                                   cache_dir=None, cpu_threads=threads, enable_mkldnn=enable_mkldnn)
+                item = {
+                    'workers': workers,
+                    'cpu_threads': threads,
+                    'enable_mkldnn': enable_mkldnn,
+                    'images_per_sec': 0.0,
+                    'fail': len(sample),
+                    'error': None
+                }
+                try:
+                    with IsolatedPool(workers, init_kwargs) as pool:
+                        pool.wait_ready()
+                        # 预热：首次推理包含内存分配等一次性开销
+                        list(pool.imap_unordered(sample[:workers]))
+                        start = time.perf_counter()
+                        processed = list(pool.imap_unordered(sample))
+                        elapsed = time.perf_counter() - start
+                except RuntimeError as e:
+                    # 该组合无法启动（如 MKLDNN 不可用）：记为失败，继续测量其余组合
+                    item['error'] = str(e)
+                    print(f"✗ 进程数 {workers} 线程数 {threads} MKLDNN {'开启' if enable_mkldnn else '关闭'}: {e}")
+                else:
+                    success = sum(1 for processed_item in processed if processed_item[1])
+                    # 只按成功处理的图片计吞吐，失败快的组合不会排到前面
+                    item['images_per_sec'] = success / elapsed if elapsed > 0 else 0.0
+                    item['fail'] = len(processed) - success
+                results.append(item)
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+    # 有失败的组合排在全部成功的组合之后
+    results.sort(key=lambda item: (item['fail'] > 0, -item['images_per_sec']))
+
+    print("\n" + "=" * 80)
+    print("线程校准结果")
+    print("=" * 80)
+    widths = (8, 8, 8, 10, 10)
+    header = ('进程数', '线程数', 'MKLDNN', '图片/秒', '失败')
+    print('  ' + ''.join(_rjust(text, width) for text, width in zip(header, widths)))
+    for item in results:
+        row = (item['workers'], item['cpu_threads'], '开启' if item['enable_mkldnn'] else '关闭',
+               '-' if item['error'] else f"{item['images_per_sec']:.2f}",
+               '启动失败' if item['error'] else item['fail'])
+        print('  ' + ''.join(_rjust(text, width) for text, width in zip(row, widths)))
+    best = results[0]
+    if best['fail'] > 0:
+        print("\n所有组合都有图片处理失败，无法给出推荐参数")
+        print("=" * 80)
+        return []
+    print(f"\n推荐参数: --device cpu --workers {best['workers']} --cpu_threads {best['cpu_threads']}"
+          + (" --enable_mkldnn" if best['enable_mkldnn'] else ""))
+    print("=" * 80)
+    return results
+
+
+def _parse_lang_rule(value):
+    """解析 --lang_rule 参数 "正则=语言" """
+    pattern, sep, rule_lang = value.rpartition('=')
+    if not sep or not pattern or not rule_lang:
+        raise argparse.ArgumentTypeError(f"语言规则格式应为 正则=语言: {value}")
+    try:
+        re.compile(pattern)
+    except re.error as e:
+        raise argparse.ArgumentTypeError(f"无效的正则表达式 {pattern}: {e}")
+    if rule_lang not in SUPPORTED_LANGS:
+        raise argparse.ArgumentTypeError(
+            f"不支持的语言 {rule_lang}（可选: {'、'.join(SUPPORTED_LANGS)}）")
+    return pattern, rule_lang
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(
+        description='批量表格识别工具 - 基于 PaddleOCR PPStructure',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+示例用法:
+  # 使用 GPU 识别当前目录所有图片
+  python batch_table_recognition.py --device gpu
+
+  # 指定图片目录和输出目录
+  python batch_table_recognition.py --device gpu --image_dir ./images --output_dir ./results
+
+  # 使用 CPU
+  python batch_table_recognition.py --device cpu
+
+  # 递归处理子目录中的所有图片
+  python batch_table_recognition.py --device gpu --image_dir ./images --recursive
+
+  # 使用 8 个进程并行识别（适合多核 CPU）
+  python batch_table_recognition.py --device cpu --workers 8
+
+  # 后台预读取 8 张图片，读取解码与推理并行（适合网络存储）
+  python batch_table_recognition.py --device gpu --prefetch 8
+
+  # 预读取 + 后台写出，读取、推理、写出三段流水线并行
+  python batch_table_recognition.py --device gpu --prefetch 8 --async_write
+
+  # 中英韩混合目录：按文件名前缀选择语言，一次运行按需加载各语言模型
+  python batch_table_recognition.py --device gpu --lang_rule "^en_=en" --lang_rule "^kr_=korean"
+
+  # 多台机器分担同一目录：各自运行，指向同一共享租约目录
+  python batch_table_recognition.py --image_dir /mnt/share/images --output_dir /mnt/share/output --shard_dir /mnt/share/leases
+
+  # CPU 推理：先校准本机最快的 工作进程数×线程数 组合，再按推荐参数运行
+  python batch_table_recognition.py --device cpu --calibrate --image_dir ./images
+  python batch_table_recognition.py --device cpu --workers 4 --cpu_threads 4
+
+  # 单表格截图：跳过版面分析，裁掉空白边后直接识别表格
+  python batch_table_recognition.py --device gpu --table_only --crop_border
+
+  # 大尺寸截图先缩小到长边 1600 像素并裁掉空白边再识别
+  python batch_table_recognition.py --device cpu --max_side 1600 --crop_border
+
+  # 高分辨率照片直接降分辨率解码，再缩放到长边 1600 像素
+  python batch_table_recognition.py --device cpu --max_side 1600 --fast_decode
+
+  # 缓存识别结果，重复图片不再重新识别
+  python batch_table_recognition.py --device gpu --cache_dir .table_cache
+
+  # 记录每张图片的分阶段耗时，判断瓶颈在 I/O 还是推理
+  python batch_table_recognition.py --device cpu --timing_file timings.jsonl
+
+  # 与其他服务共用机器时，使用低内存模式避免 OOM
+  python batch_table_recognition.py --device cpu --workers 4 --low_memory
+
+  # 中断后继续：跳过已成功的图片，只处理剩余和失败的图片
+  python batch_table_recognition.py --device gpu --resume
+
+  # 服务模式：模型常驻，POST 图片字节到 /recognize 获取表格 HTML/JSON
+  python batch_table_recognition.py --device gpu --serve --port 8866
+  curl --data-binary @table.jpg http://127.0.0.1:8866/recognize
         """
     )
 
@@ -289,30 +2495,163 @@ def main():
                         help='图片所在目录（默认: 当前目录）')
     parser.add_argument('--image_pattern', type=str, default='*.jpg',
                         help='图片文件匹配模式（默认: *.jpg）')
+    parser.add_argument('--recursive', action='store_true',
+                        help='递归扫描子目录中的图片')
+    parser.add_argument('--count_total', action='store_true',
+                        help='处理前先统计图片总数，用于显示进度（大目录会多一次扫描）')
     parser.add_argument('--output_dir', type=str, default='output',
                         help='输出目录（默认: output）')
     parser.add_argument('--device', type=str, default='gpu', choices=['cpu', 'gpu'],
                         help='设备类型（默认: gpu）')
-    parser.add_argument('--lang', type=str, default='ch', choices=['ch', 'en', 'korean'],
+    parser.add_argument('--lang', type=str, default='ch', choices=SUPPORTED_LANGS,
                         help='语言类型（默认: ch 中文，en 英文，korean 韩文）')
+    parser.add_argument('--lang_rule', type=_parse_lang_rule, action='append', default=None,
+                        metavar='正则=语言',
+                        help='按文件名选择语言，可重复指定，如 --lang_rule "^en_=en"；'
+                             '图片旁的同名 .lang 文件优先，其余使用 --lang')
+    parser.add_argument('--serve', action='store_true',
+                        help='以服务模式运行：保持模型常驻，通过本地 HTTP 或 Unix socket 接收识别请求')
+    parser.add_argument('--host', type=str, default='127.0.0.1',
+                        help='服务模式监听地址（默认: 127.0.0.1）')
+    parser.add_argument('--port', type=int, default=8866,
+                        help='服务模式监听端口（默认: 8866）')
+    parser.add_argument('--unix_socket', type=str, default=None,
+                        help='服务模式改为监听 Unix socket 路径（优先于 --host/--port）')
+    parser.add_argument('--max_concurrency', type=int, default=4,
+                        help='服务模式同时处理的请求数（解码、推理、编码响应），推理本身串行（默认: 4）')
+    parser.add_argument('--max_queue', type=int, default=32,
+                        help='服务模式排队等待的请求上限，超出返回 503（默认: 32）')
+    parser.add_argument('--batch_size', type=int, default=1,
+                        help='服务模式微批大小，凑批后集中推理，不超过 --max_concurrency（默认: 1，逐张推理）')
+    parser.add_argument('--batch_wait_ms', type=int, default=10,
+                        help='服务模式微批最长等待时间，越大吞吐越高、延迟越大（默认: 10 毫秒）')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='并行工作进程数，每个进程加载一个引擎（默认: 1，即串行处理）')
+    parser.add_argument('--prefetch', type=int, default=0,
+                        help='预读取队列深度，后台线程提前读取解码图片（默认: 0，不预读取）')
+    parser.add_argument('--io_threads', type=int, default=None,
+                        help='预读取线程数（默认: min(prefetch, 4)）')
+    parser.add_argument('--async_write', action='store_true',
+                        help='由后台线程写出识别结果，不阻塞下一张图片的推理')
+    parser.add_argument('--write_queue', type=int, default=8,
+                        help='后台写出队列长度（默认: 8）')
+    parser.add_argument('--table_only', action='store_true',
+                        help='纯表格模式：跳过版面分析，整张图片直接作为表格识别（适合单表格截图，可配合 --crop_border）')
+    parser.add_argument('--max_side', type=int, default=0,
+                        help='预处理：长边超过该像素数时缩小后再识别，坐标映射回原图（默认: 0，不缩放）')
+    parser.add_argument('--crop_border', action='store_true',
+                        help='预处理：裁掉图片四周的空白边')
+    parser.add_argument('--grayscale', action='store_true',
+                        help='预处理：转为灰度后识别')
+    parser.add_argument('--fast_decode', action='store_true',
+                        help='大尺寸 JPEG 按 --max_side 直接以 1/2、1/4、1/8 分辨率解码，降低解码耗时和内存')
+    parser.add_argument('--mmap', action='store_true',
+                        help='以内存映射方式读取本地图片文件，减少一次内存复制（网络文件系统上自动改用普通读取）')
+    parser.add_argument('--cache_dir', type=str, default=None,
+                        help='识别结果缓存目录，内容相同的图片直接复用缓存结果（默认: 不使用缓存）')
+    parser.add_argument('--cache_size_mb', type=int, default=1024,
+                        help='缓存容量上限 MB，针对整个缓存目录（多个工作进程共享），'
+                             '超出后淘汰最近最少使用的结果（默认: 1024）')
+    parser.add_argument('--cache_phash', action='store_true',
+                        help='使用感知哈希作为缓存键，重新压缩保存的重复图片也能命中；'
+                             '注意版式相同、只有数字不同的表格也可能命中彼此的结果')
+    parser.add_argument('--timing_file', type=str, default=None,
+                        help='分阶段耗时 JSONL 输出路径（读取、解码、版面、表格、OCR、写出），结束时打印 p50/p95/p99')
+    parser.add_argument('--low_memory', action='store_true',
+                        help='低内存模式：丢弃结果中的区域裁剪图，限制同时在途的图片数，结束时报告内存峰值')
+    parser.add_argument('--table_records', action='store_true',
+                        help='同时写出表格记录（output_dir/.tables/），merge_results.py --from_records 直接读取')
+    parser.add_argument('--cpu_threads', type=int, default=None,
+                        help='CPU 推理每个进程的数学库线程数（默认: 可用核数 / 工作进程数）')
+    parser.add_argument('--enable_mkldnn', action='store_true',
+                        help='CPU 推理启用 MKLDNN 加速')
+    parser.add_argument('--calibrate', action='store_true',
+                        help='线程校准：用 --image_dir 中的样本图片测量各 工作进程数×线程数 组合的吞吐，输出推荐参数')
+    parser.add_argument('--calibrate_images', type=int, default=16,
+                        help='线程校准使用的样本图片数（默认: 16）')
+    parser.add_argument('--image_timeout', type=float, default=0,
+                        help='单张图片超时（秒），超时的工作进程被杀死重启，图片记为失败（默认: 0 不限制）')
+    parser.add_argument('--max_memory_mb', type=int, default=0,
+                        help='工作进程常驻内存上限 MB，超出时杀死重启，图片记为失败；'
+                             '每 50 毫秒轮询检查，不是硬限制（默认: 0 不限制）')
+    parser.add_argument('--shard_dir', type=str, default=None,
+                        help='分片模式：多个进程或主机指向同一共享租约目录，按租约文件分配图片')
+    parser.add_argument('--lease_ttl', type=int, default=600,
+                        help='分片模式租约有效期（秒），崩溃节点的租约超时后由其他节点接管（默认: 600）')
+    parser.add_argument('--node_id', type=str, default=None,
+                        help='分片模式节点名，也用于本节点的处理清单文件名（默认: 主机名；'
+                             '同一主机运行多个进程时需各自指定）')
+    parser.add_argument('--shard_report', action='store_true',
+                        help='只打印 --shard_dir 中所有节点的汇总报告，不处理图片')
+    parser.add_argument('--resume', action='store_true',
+                        help='断点续跑：跳过输出目录处理清单中已成功且未变化的图片，只重试失败的图片')
 
     args = parser.parse_args()
 
+    if args.serve:
+        from recognition_server import serve
+        return serve(args)
+
+    if args.shard_report:
+        if not args.shard_dir or not os.path.isdir(args.shard_dir):
+            print("错误: --shard_report 需要指定已存在的 --shard_dir")
+            return 1
+        WorkLeases.print_report(WorkLeases.merged_report(args.shard_dir, args.lease_ttl))
+        return 0
+
     # 检查图片目录是否存在
     if not os.path.exists(args.image_dir):
         print(f"错误: 图片目录不存在: {args.image_dir}")
         sys.exit(1)
 
+    recognizer_kwargs = dict(
+        output_dir=args.output_dir,
+        use_gpu=(args.device == 'gpu'),
+        lang=args.lang,
+        cache_dir=args.cache_dir,
+        cache_size_mb=args.cache_size_mb,
+        cache_phash=args.cache_phash,
+        max_side=args.max_side,
+        crop_border=args.crop_border,
+        grayscale=args.grayscale,
+        fast_decode=args.fast_decode,
+        use_mmap=args.mmap,
+        low_memory=args.low_memory,
+        table_only=args.table_only,
+        lang_rules=args.lang_rule,
+        cpu_threads=args.cpu_threads,
+        enable_mkldnn=args.enable_mkldnn,
+        table_records=args.table_records
+    )
+
+    if args.calibrate:
+        if args.device != 'cpu':
+            print("错误: --calibrate 只用于 CPU 推理，请同时指定 --device cpu")
+            return 1
+        results = calibrate_threads(recognizer_kwargs, args.image_dir, args.image_pattern,
+                                    args.calibrate_images, args.recursive)
+        return 0 if results else 1
+
     try:
         # 创建批量识别器
-        recognizer = BatchTableRecognizer(
-            output_dir=args.output_dir,
-            use_gpu=(args.device == 'gpu'),
-            lang=args.lang
-        )
+        recognizer = BatchTableRecognizer(**recognizer_kwargs)
 
         # 执行批量识别
-        stats = recognizer.batch_recognize(args.image_dir, args.image_pattern)
+        stats = recognizer.batch_recognize(args.image_dir, args.image_pattern,
+                                           workers=args.workers,
+                                           prefetch=args.prefetch,
+                                           io_threads=args.io_threads,
+                                           async_write=args.async_write,
+                                           write_queue_size=args.write_queue,
+                                           resume=args.resume,
+                                           recursive=args.recursive,
+                                           count_total=args.count_total,
+                                           timing_file=args.timing_file,
+                                           shard_dir=args.shard_dir,
+                                           lease_ttl=args.lease_ttl,
+                                           node_id=args.node_id,
+                                           image_timeout=args.image_timeout,
+                                           max_memory_mb=args.max_memory_mb)
 
         return 0 if stats['fail'] == 0 else 1
 
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+启动耗时基准测试
+用 python -X importtime 统计各入口的模块导入耗时，并测量命令行的端到端启动时间
+
+场景:
+  import    导入 batch_table_recognition（example_usage.py 等调用方的开销）
+  help      batch_table_recognition.py --help
+  empty     对空目录执行一次批量识别（不应加载模型）
+
+每个场景报告：墙钟耗时中位数、导入总耗时、最慢的顶层模块，
+以及 paddle / paddleocr 是否被导入（延迟导入生效时这三个场景都不应导入）。
+"""
+
+import os
+import re
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+import tempfile
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT = os.path.join(REPO_DIR, 'batch_table_recognition.py')
+
+# python -X importtime 的输出格式: "import time: self [us] | cumulative | imported package"
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+HEAVY_MODULES = ('paddle', 'paddleocr', 'cv2', 'numpy')
+
+
+def scenario_commands(empty_dir, output_dir):
+    """各场景的命令行参数"""
+    return {
+        'import': ['-c', 'import batch_table_recognition'],
+        'help': [SCRIPT, '--help'],
+        'empty': [SCRIPT, '--image_dir', empty_dir, '--output_dir', output_dir],
+    }
+
+
+def parse_importtime(stderr):
+    """
+    解析 -X importtime 输出
+
+    Returns:
+        (顶层模块 [(模块名, 累计微秒), ...], 已导入的全部模块名集合)
+    """
+    top_level = []
+    modules = set()
+    for line in stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        cumulative, indent, name = int(match.group(2)), match.group(3), match.group(4)
+        modules.add(name)
+        # 缩进为 1 个空格的是被直接导入的顶层模块
+        if len(indent) == 1:
+            top_level.append((name, cumulative))
+    return top_level, modules
+
+
+def run_scenario(args, repeat):
+    """
+    重复运行一个场景
+
+    Returns:
+        (墙钟耗时列表（秒）, 最后一次的顶层模块耗时, 最后一次导入的模块集合)
+    """
+    wall_times = []
+    top_level, modules = [], set()
+    for _ in range(repeat):
+        start = time.perf_counter()
+        proc = subprocess.run([sys.executable, '-X', 'importtime'] + args,
+                              cwd=REPO_DIR, stdout=subprocess.DEVNULL,
+                              stderr=subprocess.PIPE, text=True)
+        wall_times.append(time.perf_counter() - start)
+        top_level, modules = parse_importtime(proc.stderr)
+    return wall_times, top_level, modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description='启动耗时基准测试（python -X importtime）')
+    parser.add_argument('--repeat', type=int, default=5, help='每个场景的运行次数（默认: 5）')
+    parser.add_argument('--top', type=int, default=8, help='列出最慢的顶层模块数（默认: 8）')
+    parser.add_argument('--scenarios', type=str, default='import,help,empty',
+                        help='要测试的场景，逗号分隔（默认: import,help,empty）')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        empty_dir = os.path.join(tmp_dir, 'images')
+        os.makedirs(empty_dir)
+        commands = scenario_commands(empty_dir, os.path.join(tmp_dir, 'output'))
+
+        print("=" * 80)
+        print(f"Python: {sys.executable}，每个场景运行 {args.repeat} 次")
+        print("=" * 80)
+
+        for name in args.scenarios.split(','):
+            wall_times, top_level, modules = run_scenario(commands[name], args.repeat)
+            import_total = sum(cumulative for _, cumulative in top_level) / 1000.0
+            loaded = [module for module in HEAVY_MODULES if module in modules]
+
+            print(f"\n[{name}] 墙钟耗时中位数 {statistics.median(wall_times) * 1000:.0f} ms，"
+                  f"导入合计 {import_total:.0f} ms")
+            print(f"  已导入的重量级模块: {'、'.join(loaded) if loaded else '无'}")
+            for module, cumulative in sorted(top_level, key=lambda x: -x[1])[:args.top]:
+                print(f"  {cumulative / 1000.0:8.1f} ms  {module}")
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
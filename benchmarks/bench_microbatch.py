@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+微批处理基准测试
+对比服务模式下逐张推理（引擎锁串行）与 MicroBatcher 凑批推理的吞吐和延迟
+
+直接驱动 RecognitionService.recognize（解码、预处理、推理调度与服务模式完全相同），
+只把 PPStructure 换成模拟引擎，不需要加载模型。与 PPStructure 一样，
+模拟引擎每次调用只处理一张图片，耗时 call_overhead_ms + per_image_ms；
+微批模式下 RecognitionService._recognize_batch 在调度线程中逐张调用。
+"""
+
+import io
+import os
+import sys
+import time
+import argparse
+import contextlib
+import tempfile
+import threading
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_pipeline import MockEngineFactory
+from batch_table_recognition import BatchTableRecognizer, StageTimer
+from recognition_server import RecognitionService
+
+
+def make_request_images(count, width, height):
+    """生成若干张不同的表格图片，返回 JPEG 字节列表"""
+    images = []
+    for i in range(count):
+        img = np.full((height, width, 3), 255, dtype=np.uint8)
+        for y in range(0, height, height // 10):
+            cv2.line(img, (0, y), (width - 1, y), (0, 0, 0), 1)
+        for x in range(0, width, width // 6):
+            cv2.line(img, (x, 0), (x, height - 1), (0, 0, 0), 1)
+        cv2.putText(img, f'{i:04d}', (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 0), 2)
+        ok, buffer = cv2.imencode('.jpg', img)
+        images.append(buffer.tobytes())
+    return images
+
+
+def run_clients(service, images, clients, requests_per_client):
+    """
+    并发客户端压测
+
+    Returns:
+        (每秒请求数, 延迟列表, 失败数)
+    """
+    latencies = []
+    failures = []
+    lock = threading.Lock()
+
+    def client(client_idx):
+        for i in range(requests_per_client):
+            data = images[(client_idx * requests_per_client + i) % len(images)]
+            start = time.perf_counter()
+            result, error = service.recognize(data, f'client{client_idx}-{i}')
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                if result is None:
+                    failures.append(error)
+
+    threads = [threading.Thread(target=client, args=(idx,)) for idx in range(clients)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    total = time.perf_counter() - start
+    return len(latencies) / total, latencies, len(failures)
+
+
+def report(name, throughput, latencies, extra=''):
+    ordered = sorted(latencies)
+    print(f"{name:<28} {throughput:>9.1f} req/s   "
+          f"p50 {StageTimer._percentile(ordered, 50) * 1000:>7.1f} ms   "
+          f"p95 {StageTimer._percentile(ordered, 95) * 1000:>7.1f} ms   "
+          f"p99 {StageTimer._percentile(ordered, 99) * 1000:>7.1f} ms  {extra}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='微批处理基准测试（RecognitionService + 模拟引擎）')
+    parser.add_argument('--clients', type=int, default=8, help='并发客户端数（默认: 8）')
+    parser.add_argument('--requests', type=int, default=50, help='每个客户端的请求数（默认: 50）')
+    parser.add_argument('--call_overhead_ms', type=float, default=5.0,
+                        help='每次引擎调用的固定开销（默认: 5ms）')
+    parser.add_argument('--per_image_ms', type=float, default=10.0,
+                        help='每张图片的推理耗时（默认: 10ms）')
+    parser.add_argument('--width', type=int, default=800, help='请求图片宽度（默认: 800）')
+    parser.add_argument('--height', type=int, default=600, help='请求图片高度（默认: 600）')
+    parser.add_argument('--batch_sizes', type=str, default='2,4,8',
+                        help='要测试的微批大小，逗号分隔（默认: 2,4,8）')
+    parser.add_argument('--wait_ms', type=str, default='2,10',
+                        help='要测试的最长等待时间，逗号分隔（默认: 2,10）')
+    args = parser.parse_args()
+
+    images = make_request_images(16, args.width, args.height)
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        recognizer = BatchTableRecognizer(
+            output_dir=output_dir,
+            use_gpu=False,
+            engine_factory=MockEngineFactory(args.call_overhead_ms + args.per_image_ms, 10, 6)
+        )
+        recognizer.get_engine(recognizer.lang)
+
+        print("=" * 100)
+        print(f"客户端: {args.clients} x {args.requests} 请求，"
+              f"每次引擎调用 {args.call_overhead_ms}ms 开销 + {args.per_image_ms}ms 推理（每次一张）")
+        print("=" * 100)
+
+        configs = [('逐张推理', 1, 0)]
+        for batch_size in [int(x) for x in args.batch_sizes.split(',')]:
+            for wait_ms in [float(x) for x in args.wait_ms.split(',')]:
+                configs.append((f'微批 size={batch_size} wait={wait_ms:g}ms', batch_size, wait_ms))
+
+        for name, batch_size, wait_ms in configs:
+            service = RecognitionService(recognizer, max_concurrency=args.clients,
+                                         max_queue=0, batch_size=batch_size,
+                                         batch_wait_ms=wait_ms)
+            # 识别器逐张打印的日志不计入输出
+            with contextlib.redirect_stdout(io.StringIO()):
+                throughput, latencies, failures = run_clients(service, images,
+                                                              args.clients, args.requests)
+            extra = ''
+            if service.batcher is not None:
+                service.batcher.close()
+                extra = f'平均批大小 {service.batcher.average_batch_size:.2f}'
+            if failures:
+                extra += f'  失败 {failures}'
+            report(name, throughput, latencies, extra)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批处理流程基准测试
+用确定性的模拟引擎代替 PPStructure，测量推理以外各环节的吞吐，不需要 GPU 或下载模型
+
+场景:
+  batch   BatchTableRecognizer.batch_recognize：扫描、读取解码、推理调度、写出（含 --workers 等参数）
+  save    BatchTableRecognizer.save_results：逐张写出识别结果
+  merge   merge_results.merge_tables：解析 batch 场景写出的 HTML 并合并为 Excel
+
+每个图片集规模、每个场景在独立子进程中运行，分别报告 图片/秒、MB/秒 和内存峰值。
+batch 的 MB/秒 按读入的图片字节计算，save 按写出的字节计算，merge 按读入的 HTML 字节计算。
+
+模拟引擎每次调用等待 --latency_ms 毫秒，返回一个 rows x cols 的表格，
+单元格内容由图片像素决定（同一张图片总是得到相同的 HTML）。
+未安装 PaddleOCR 时，save_structure_res 使用下面的替代实现（只写出 res_0.txt）。
+"""
+
+import os
+import sys
+import json
+import time
+import types
+import zlib
+import shutil
+import argparse
+import tempfile
+import subprocess
+from contextlib import contextmanager
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+
+def _standin_save_structure_res(res, save_folder, img_name, img_idx=0):
+    """save_structure_res 的替代实现：与 PaddleOCR 一样把每个区域（去掉 img）写成一行 JSON"""
+    excel_save_folder = os.path.join(save_folder, img_name)
+    os.makedirs(excel_save_folder, exist_ok=True)
+    with open(os.path.join(excel_save_folder, f'res_{img_idx}.txt'), 'w', encoding='utf-8') as f:
+        for region in res:
+            region = {key: value for key, value in region.items() if key != 'img'}
+            f.write(json.dumps(region, ensure_ascii=False) + '\n')
+
+
+def _install_paddleocr_standin():
+    """
+    未安装 PaddleOCR 时注册替代模块
+
+    在模块导入时执行，spawn 方式启动的工作进程导入本脚本时同样会注册。
+
+    Returns:
+        save_structure_res 的来源说明
+    """
+    try:
+        import paddleocr  # noqa: F401
+        return 'PaddleOCR'
+    except ImportError:
+        module = types.ModuleType('paddleocr')
+        module.save_structure_res = _standin_save_structure_res
+        sys.modules['paddleocr'] = module
+        return '替代实现（未安装 PaddleOCR）'
+
+
+SAVE_IMPL = _install_paddleocr_standin()
+
+
+class MockTableEngine:
+    """确定性的模拟 PPStructure 引擎"""
+
+    def __init__(self, latency_ms=20.0, rows=10, cols=6):
+        self.latency_ms = latency_ms
+        self.rows = rows
+        self.cols = cols
+
+    def __call__(self, img):
+        time.sleep(self.latency_ms / 1000.0)
+
+        h, w = img.shape[:2]
+        seed = zlib.crc32(img[::16, ::16].tobytes())
+        cell_w, cell_h = w / self.cols, h / self.rows
+
+        html_rows = []
+        cell_bbox = []
+        for r in range(self.rows):
+            cells = []
+            for c in range(self.cols):
+                if r == 0:
+                    cells.append(f'<td>列{c}</td>')
+                else:
+                    cells.append(f'<td>{(seed + r * 131 + c * 17) % 100000}</td>')
+                x0, y0 = c * cell_w, r * cell_h
+                cell_bbox.append([x0, y0, x0 + cell_w, y0, x0 + cell_w, y0 + cell_h, x0, y0 + cell_h])
+            html_rows.append('<tr>' + ''.join(cells) + '</tr>')
+        html = '<html><body><table>' + ''.join(html_rows) + '</table></body></html>'
+
+        return [{
+            'type': 'table',
+            'bbox': [0, 0, w, h],
+            'img': img,
+            'res': {'html': html, 'cell_bbox': cell_bbox}
+        }]
+
+
+class MockEngineFactory:
+    """模拟引擎构造函数（可被 pickle，供多进程模式使用）"""
+
+    def __init__(self, latency_ms, rows, cols):
+        self.latency_ms = latency_ms
+        self.rows = rows
+        self.cols = cols
+
+    def __call__(self, lang):
+        return MockTableEngine(self.latency_ms, self.rows, self.cols)
+
+
+def generate_images(image_dir, count, width, height):
+    """
+    生成带表格线和文字的合成图片
+
+    Returns:
+        图片总字节数
+    """
+    import cv2
+    import numpy as np
+
+    os.makedirs(image_dir, exist_ok=True)
+    rng = np.random.default_rng(0)
+    total_bytes = 0
+    for i in range(count):
+        img = np.full((height, width, 3), 255, dtype=np.uint8)
+        rows, cols = 10, 6
+        for r in range(rows + 1):
+            y = 20 + r * (height - 40) // rows
+            cv2.line(img, (20, y), (width - 20, y), (0, 0, 0), 2)
+        for c in range(cols + 1):
+            x = 20 + c * (width - 40) // cols
+            cv2.line(img, (x, 20), (x, height - 20), (0, 0, 0), 2)
+        for r in range(rows):
+            for c in range(cols):
+                x = 30 + c * (width - 40) // cols
+                y = 20 + (r + 1) * (height - 40) // rows - 10
+                cv2.putText(img, str(int(rng.integers(0, 100000))), (x, y),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 0), 1)
+        noise = rng.integers(0, 12, size=img.shape, dtype=np.uint8)
+        img = cv2.subtract(img, noise)
+
+        ok, buffer = cv2.imencode('.jpg', img, [cv2.IMWRITE_JPEG_QUALITY, 90])
+        path = os.path.join(image_dir, f'img_{i:05d}.jpg')
+        buffer.tofile(path)
+        total_bytes += buffer.size
+    return total_bytes
+
+
+def dir_bytes(path, suffix=''):
+    """目录下（递归）指定后缀文件的总字节数"""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            if name.endswith(suffix):
+                total += os.path.getsize(os.path.join(root, name))
+    return total
+
+
+@contextmanager
+def quiet():
+    """把标准输出（包括子进程继承的文件描述符）重定向到空设备"""
+    sys.stdout.flush()
+    saved = os.dup(1)
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    try:
+        os.dup2(devnull, 1)
+        yield
+    finally:
+        sys.stdout.flush()
+        os.dup2(saved, 1)
+        os.close(saved)
+        os.close(devnull)
+
+
+def run_batch(args):
+    """batch 场景"""
+    from batch_table_recognition import BatchTableRecognizer
+
+    factory = MockEngineFactory(args.latency_ms, args.rows, args.cols)
+    with quiet():
+        recognizer = BatchTableRecognizer(output_dir=args.output_dir, use_gpu=False,
+                                          low_memory=args.low_memory, engine_factory=factory)
+        stats = recognizer.batch_recognize(args.image_dir, '*.jpg',
+                                           workers=args.workers,
+                                           prefetch=args.prefetch,
+                                           async_write=args.async_write)
+    return stats['success'] + stats['fail'], dir_bytes(args.image_dir), stats['elapsed_time']
+
+
+def run_save(args):
+    """save 场景"""
+    import numpy as np
+    from batch_table_recognition import BatchTableRecognizer
+
+    engine = MockTableEngine(0, args.rows, args.cols)
+    count = len(os.listdir(args.image_dir))
+    img = np.full((args.height, args.width, 3), 255, dtype=np.uint8)
+    with quiet():
+        recognizer = BatchTableRecognizer(output_dir=args.output_dir, use_gpu=False,
+                                          engine_factory=MockEngineFactory(0, args.rows, args.cols))
+        results = engine(img)
+        start = time.perf_counter()
+        for i in range(count):
+            recognizer.save_results(f'img_{i:05d}.jpg', results)
+        elapsed = time.perf_counter() - start
+    return count, dir_bytes(args.output_dir), elapsed
+
+
+def run_merge(args):
+    """merge 场景"""
+    from merge_results import merge_tables
+
+    html_bytes = dir_bytes(args.output_dir, '.html')
+    html_files = sum(1 for _, _, files in os.walk(args.output_dir)
+                     for name in files if name.endswith('.html'))
+    with quiet():
+        start = time.perf_counter()
+        merge_tables(args.output_dir, 'merged_bench.xlsx')
+        elapsed = time.perf_counter() - start
+    return html_files, html_bytes, elapsed
+
+
+SCENARIOS = {'batch': run_batch, 'save': run_save, 'merge': run_merge}
+
+
+def run_child(args):
+    """子进程：运行一个场景并输出一行 JSON"""
+    from batch_table_recognition import peak_rss
+
+    count, nbytes, elapsed = SCENARIOS[args.child](args)
+    own, children = peak_rss()
+    print(json.dumps({'count': count, 'bytes': nbytes, 'elapsed': elapsed,
+                      'peak_rss_mb': own, 'peak_rss_children_mb': children}))
+    return 0
+
+
+def run_in_subprocess(scenario, args, image_dir, output_dir):
+    """在独立子进程中运行场景，内存峰值互不影响"""
+    cmd = [sys.executable, os.path.abspath(__file__), '--child', scenario,
+           '--image_dir', image_dir, '--output_dir', output_dir,
+           '--latency_ms', str(args.latency_ms), '--rows', str(args.rows), '--cols', str(args.cols),
+           '--width', str(args.width), '--height', str(args.height),
+           '--workers', str(args.workers), '--prefetch', str(args.prefetch)]
+    if args.async_write:
+        cmd.append('--async_write')
+    if args.low_memory:
+        cmd.append('--low_memory')
+    proc = subprocess.run(cmd, stdout=subprocess.PIPE, text=True, check=True)
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def report(scenario, size, result):
+    elapsed = max(result['elapsed'], 1e-9)
+    peak = result['peak_rss_mb']
+    if result['peak_rss_children_mb']:
+        peak = f"{peak:.0f} / {result['peak_rss_children_mb']:.0f}"
+    elif peak is not None:
+        peak = f"{peak:.0f}"
+    print(f"{scenario:<8}{size:>8}{result['count'] / elapsed:>12.1f}"
+          f"{result['bytes'] / 1024 / 1024 / elapsed:>12.2f}{elapsed:>10.2f}   {peak}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='批处理流程基准测试（模拟引擎）')
+    parser.add_argument('--sizes', type=str, default='20,100',
+                        help='图片集规模（张数），逗号分隔（默认: 20,100）')
+    parser.add_argument('--scenarios', type=str, default='batch,save,merge',
+                        help='要测试的场景，逗号分隔（默认: batch,save,merge）')
+    parser.add_argument('--width', type=int, default=1600, help='合成图片宽度（默认: 1600）')
+    parser.add_argument('--height', type=int, default=1200, help='合成图片高度（默认: 1200）')
+    parser.add_argument('--latency_ms', type=float, default=20.0,
+                        help='模拟引擎每张图片的推理耗时（默认: 20ms）')
+    parser.add_argument('--rows', type=int, default=10, help='模拟表格行数（默认: 10）')
+    parser.add_argument('--cols', type=int, default=6, help='模拟表格列数（默认: 6）')
+    parser.add_argument('--workers', type=int, default=1, help='batch 场景的工作进程数（默认: 1）')
+    parser.add_argument('--prefetch', type=int, default=0, help='batch 场景的预读取深度（默认: 0）')
+    parser.add_argument('--async_write', action='store_true', help='batch 场景使用后台写出')
+    parser.add_argument('--low_memory', action='store_true', help='batch 场景使用低内存模式')
+    parser.add_argument('--work_dir', type=str, default=None,
+                        help='图片集和输出目录的存放位置（默认: 临时目录，结束后删除）')
+    parser.add_argument('--child', choices=sorted(SCENARIOS), help=argparse.SUPPRESS)
+    parser.add_argument('--image_dir', type=str, help=argparse.SUPPRESS)
+    parser.add_argument('--output_dir', type=str, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return run_child(args)
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix='bench_pipeline_')
+    scenarios = args.scenarios.split(',')
+    try:
+        print("=" * 80)
+        print(f"图片 {args.width}x{args.height}，模拟推理 {args.latency_ms:g}ms/张，"
+              f"表格 {args.rows}x{args.cols}")
+        print(f"batch 参数: workers={args.workers} prefetch={args.prefetch} "
+              f"async_write={args.async_write} low_memory={args.low_memory}")
+        print(f"save_structure_res: {SAVE_IMPL}")
+        print("=" * 80)
+        print(f"{'场景':<6}{'图片数':>6}{'图片/秒':>9}{'MB/秒':>10}{'耗时(秒)':>8}   内存峰值 MB（主进程 / 工作进程）")
+
+        for size in [int(x) for x in args.sizes.split(',')]:
+            image_dir = os.path.join(work_dir, f'images_{size}')
+            if not os.path.isdir(image_dir):
+                generate_images(image_dir, size, args.width, args.height)
+
+            batch_output = os.path.join(work_dir, f'output_batch_{size}')
+            save_output = os.path.join(work_dir, f'output_save_{size}')
+            for output_dir in (batch_output, save_output):
+                shutil.rmtree(output_dir, ignore_errors=True)
+
+            for scenario in scenarios:
+                if scenario == 'merge' and 'batch' not in scenarios:
+                    # merge 场景读取 batch 场景的输出
+                    run_in_subprocess('batch', args, image_dir, batch_output)
+                output_dir = save_output if scenario == 'save' else batch_output
+                report(scenario, size, run_in_subprocess(scenario, args, image_dir, output_dir))
+    finally:
+        if args.work_dir is None:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
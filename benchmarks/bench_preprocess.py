@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+预处理精度/速度基准测试
+在样本图片上对比不同预处理参数（长边缩放、裁剪空白边、灰度）的识别耗时，
+以及表格单元格文本与原图识别结果的一致程度，用于选择安全的 --max_side
+
+需要真实的 PaddleOCR 模型（与 batch_table_recognition.py 相同的运行环境）
+
+示例:
+  python benchmarks/bench_preprocess.py --image_dir . --limit 20 --max_sides 0,2400,1600,1280,960
+"""
+
+import os
+import re
+import sys
+import time
+import html
+import difflib
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batch_table_recognition import BatchTableRecognizer, iter_image_files
+
+
+CELL_PATTERN = re.compile(r'<t[dh][^>]*>(.*?)</t[dh]>', re.S | re.I)
+TAG_PATTERN = re.compile(r'<[^>]+>')
+
+
+def table_cells(result):
+    """提取识别结果中所有表格的单元格文本"""
+    cells = []
+    for item in result or []:
+        if item.get('type') == 'table':
+            for cell in CELL_PATTERN.findall(item.get('res', {}).get('html', '')):
+                cells.append(html.unescape(TAG_PATTERN.sub('', cell)).strip())
+    return cells
+
+
+def similarity(baseline, cells):
+    """单元格序列相似度（0~1），两者都为空时为 1"""
+    if not baseline and not cells:
+        return 1.0
+    return difflib.SequenceMatcher(None, baseline, cells, autojunk=False).ratio()
+
+
+def run_config(recognizer, image_paths, max_side, crop_border, grayscale):
+    """
+    用指定预处理参数识别所有样本
+
+    Returns:
+        [(耗时秒, 单元格文本列表), ...]
+    """
+    recognizer.max_side = max_side
+    recognizer.crop_border = crop_border
+    recognizer.grayscale = grayscale
+
+    outcomes = []
+    for image_path in image_paths:
+        start = time.perf_counter()
+        result = recognizer.recognize_single_image(image_path)
+        outcomes.append((time.perf_counter() - start, table_cells(result)))
+    return outcomes
+
+
+def main():
+    parser = argparse.ArgumentParser(description='预处理精度/速度基准测试')
+    parser.add_argument('--image_dir', type=str, default='.', help='样本图片目录（默认: 当前目录）')
+    parser.add_argument('--limit', type=int, default=20, help='最多使用多少张样本（默认: 20）')
+    parser.add_argument('--device', type=str, default='cpu', choices=['cpu', 'gpu'],
+                        help='设备类型（默认: cpu）')
+    parser.add_argument('--lang', type=str, default='ch', help='语言（默认: ch）')
+    parser.add_argument('--max_sides', type=str, default='0,2400,1600,1280,960',
+                        help='要测试的长边上限，逗号分隔，0 表示不缩放（默认: 0,2400,1600,1280,960）')
+    parser.add_argument('--crop_border', action='store_true', help='同时测试裁剪空白边')
+    parser.add_argument('--grayscale', action='store_true', help='同时测试灰度')
+    args = parser.parse_args()
+
+    image_paths = sorted(iter_image_files(args.image_dir))[:args.limit]
+    if not image_paths:
+        print("未找到样本图片！")
+        return 1
+
+    recognizer = BatchTableRecognizer(output_dir='bench_output',
+                                      use_gpu=(args.device == 'gpu'), lang=args.lang)
+
+    # 预热，避免首张图片的初始化开销计入基线
+    recognizer.recognize_single_image(image_paths[0])
+
+    configs = [(int(x), False, False) for x in args.max_sides.split(',')]
+    if args.crop_border:
+        configs += [(max_side, True, False) for max_side, _, _ in list(configs)]
+    if args.grayscale:
+        configs += [(max_side, crop, True) for max_side, crop, _ in list(configs)]
+    if (0, False, False) in configs:
+        configs.remove((0, False, False))
+
+    baseline = run_config(recognizer, image_paths, 0, False, False)
+    baseline_time = sum(t for t, _ in baseline) / len(baseline)
+
+    rows = [('原图', baseline_time, 1.0, 1.0)]
+    for max_side, crop_border, grayscale in configs:
+        outcomes = run_config(recognizer, image_paths, max_side, crop_border, grayscale)
+        mean_time = sum(t for t, _ in outcomes) / len(outcomes)
+        scores = [similarity(base_cells, cells)
+                  for (_, base_cells), (_, cells) in zip(baseline, outcomes)]
+        name = f"max_side={max_side or '-'}"
+        if crop_border:
+            name += ' +crop'
+        if grayscale:
+            name += ' +gray'
+        rows.append((name, mean_time, sum(scores) / len(scores), min(scores)))
+
+    print("\n" + "=" * 80)
+    print(f"样本: {len(image_paths)} 张（{os.path.abspath(args.image_dir)}）")
+    print("相似度: 与原图识别结果的表格单元格文本序列相似度")
+    print("=" * 80)
+    print(f"{'配置':<28}{'平均耗时(ms)':>14}{'加速比':>10}{'平均相似度':>12}{'最低相似度':>12}")
+    for name, mean_time, mean_score, min_score in rows:
+        print(f"{name:<28}{mean_time * 1000:>14.1f}{baseline_time / mean_time:>10.2f}"
+              f"{mean_score:>12.3f}{min_score:>12.3f}")
+    print("=" * 80)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+表格 HTML 解析基准测试
+对比 merge_results 原来的 BeautifulSoup 解析与 table_html 快速解析的吞吐，并校验两者结果一致
+
+输入为 --input_dir 下的 HTML 文件（如 batch_table_recognition.py 的输出目录），
+未指定时生成与 save_results 写出格式相同的合成表格。
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import table_html
+
+
+def synthetic_tables(count, rows, cols, seed=0):
+    """生成 save_results 格式的表格 HTML（含表头、合并单元格、实体和行内标签）"""
+    rng = random.Random(seed)
+    words = ['合计', '金额', '数量', 'A&amp;B', '2024-01-01', '&nbsp;', '<b>加粗</b>', ' 12.50 ', '备注']
+    documents = []
+    for i in range(count):
+        body = ['<thead><tr>' + ''.join(f'<td>列{c}</td>' for c in range(cols)) + '</tr></thead><tbody>']
+        for r in range(rows):
+            cells = []
+            for c in range(cols):
+                if c == 0 and rng.random() < 0.1:
+                    cells.append(f'<td colspan="2">{rng.choice(words)}</td>')
+                else:
+                    cells.append(f'<td>{rng.choice(words)}{rng.randint(0, 99999)}</td>')
+            body.append('<tr>' + ''.join(cells) + '</tr>')
+        body.append('</tbody>')
+        documents.append('<!DOCTYPE html>\n<html>\n<head>\n<meta charset="UTF-8">\n'
+                         f'<title>img_{i} - Table 0</title>\n<style>\n'
+                         'table { border-collapse: collapse; margin: 20px 0; width: 100%; }\n'
+                         'td, th { border: 1px solid #ddd; padding: 8px; text-align: left; }\n'
+                         '</style>\n</head>\n<body>\n'
+                         f'<h2>img_{i} - Table 0</h2>\n'
+                         '<html><body><table>' + ''.join(body) + '</table></body></html>'
+                         '\n</body>\n</html>')
+    return documents
+
+
+def load_tables(input_dir):
+    """读取目录下（递归）所有 HTML 文件"""
+    documents = []
+    for root, _, files in os.walk(input_dir):
+        for name in sorted(files):
+            if name.endswith('.html'):
+                with open(os.path.join(root, name), 'r', encoding='utf-8') as f:
+                    documents.append(f.read())
+    return documents
+
+
+def measure(parse, documents, repeat):
+    """重复解析全部文档，返回最快一次的耗时和解析结果"""
+    best = None
+    results = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = [parse(document) for document in documents]
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='表格 HTML 解析基准测试')
+    parser.add_argument('--input_dir', type=str, default=None,
+                        help='HTML 文件目录（默认: 生成合成表格）')
+    parser.add_argument('--tables', type=int, default=500, help='合成表格数（默认: 500）')
+    parser.add_argument('--rows', type=int, default=30, help='合成表格行数（默认: 30）')
+    parser.add_argument('--cols', type=int, default=8, help='合成表格列数（默认: 8）')
+    parser.add_argument('--repeat', type=int, default=3, help='重复次数，取最快一次（默认: 3）')
+    args = parser.parse_args()
+
+    if args.input_dir:
+        documents = load_tables(args.input_dir)
+        source = args.input_dir
+    else:
+        documents = synthetic_tables(args.tables, args.rows, args.cols)
+        source = f"合成表格 {args.rows}x{args.cols}"
+    if not documents:
+        print("未找到 HTML 文件！")
+        return 1
+
+    total_mb = sum(len(document.encode('utf-8')) for document in documents) / 1024 / 1024
+    fallbacks = sum(1 for document in documents if table_html._parse_fast(document) is None)
+
+    print("=" * 80)
+    print(f"输入: {source}，{len(documents)} 个表格，{total_mb:.2f} MB")
+    print(f"快速路径无法处理、改用 BeautifulSoup 的表格: {fallbacks}")
+    print("=" * 80)
+
+    bs4_time, bs4_rows = measure(table_html._parse_with_bs4, documents, args.repeat)
+    fast_time, fast_rows = measure(table_html.parse_table_rows, documents, args.repeat)
+
+    mismatches = sum(1 for a, b in zip(bs4_rows, fast_rows) if a != b)
+
+    print(f"{'解析方式':<16}{'耗时(秒)':>10}{'表格/秒':>12}{'MB/秒':>10}")
+    for name, elapsed in (('BeautifulSoup', bs4_time), ('table_html', fast_time)):
+        print(f"{name:<20}{elapsed:>10.3f}{len(documents) / elapsed:>12.1f}{total_mb / elapsed:>10.2f}")
+    print(f"\n加速比: {bs4_time / fast_time:.1f}x")
+    print(f"结果不一致的表格: {mismatches}")
+    print("=" * 80)
+    return 0 if mismatches == 0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
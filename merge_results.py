@@ -7,68 +7,393 @@
 
 import os
 import sys
+import pickle
+import hashlib
 import argparse
+import multiprocessing
 from pathlib import Path
-from bs4 import BeautifulSoup
 import pandas as pd
 from datetime import datetime
 
+from table_html import parse_table_rows, parse_table_head
 
-def parse_html_table(html_file):
+
+def rows_to_dataframe(rows):
     """
-    解析 HTML 文件中的表格
+    把表格行转换为 DataFrame
 
     Args:
-        html_file: HTML 文件路径
+        rows: 行列表 [[单元格文本, ...], ...]
 
     Returns:
         pandas DataFrame 或 None
     """
+    if not rows:
+        return None
+
+    # 创建 DataFrame
+    # 假设第一行是表头
+    if len(rows) > 1:
+        return pd.DataFrame(rows[1:], columns=rows[0] if rows[0] else None)
+    return pd.DataFrame(rows)
+
+
+def read_html_rows(html_file):
+    """
+    读取 HTML 文件中第一个表格的行
+
+    Args:
+        html_file: HTML 文件路径
+
+    Returns:
+        行列表，读取失败时为 None
+    """
     try:
         with open(html_file, 'r', encoding='utf-8') as f:
             content = f.read()
 
-        soup = BeautifulSoup(content, 'html.parser')
-        table = soup.find('table')
-
-        if table is None:
-            return None
-
-        # 提取所有行
-        rows = []
-        for tr in table.find_all('tr'):
-            cells = []
-            for td in tr.find_all(['td', 'th']):
-                # 获取单元格文本，处理换行
-                text = td.get_text(strip=True)
-                cells.append(text)
-            if cells:
-                rows.append(cells)
-
-        if not rows:
-            return None
-
-        # 创建 DataFrame
-        # 假设第一行是表头
-        if len(rows) > 1:
-            df = pd.DataFrame(rows[1:], columns=rows[0] if rows[0] else None)
-        else:
-            df = pd.DataFrame(rows)
-
-        return df
+        # 提取所有行（快速解析，结果与 BeautifulSoup 的 get_text(strip=True) 一致）
+        return parse_table_rows(content)
 
     except Exception as e:
         print(f"  ⚠ 解析失败 {html_file}: {str(e)}")
         return None
 
 
-def merge_tables(output_dir, merged_file='merged_results.xlsx'):
+def table_from_rows(rows, source):
+    """
+    把表格行转换为 DataFrame，失败时给出提示
+
+    Args:
+        rows: 行列表或 None
+        source: 用于提示的来源文件
+
+    Returns:
+        pandas DataFrame 或 None
+    """
+    try:
+        return rows_to_dataframe(rows)
+    except Exception as e:
+        print(f"  ⚠ 解析失败 {source}: {str(e)}")
+        return None
+
+
+def parse_html_table(html_file):
+    """
+    解析 HTML 文件中的表格
+
+    Args:
+        html_file: HTML 文件路径
+
+    Returns:
+        pandas DataFrame 或 None
+    """
+    return table_from_rows(read_html_rows(html_file), html_file)
+
+
+def iter_parsed_tables(html_files, workers=1, parse=parse_html_table):
+    """
+    按 html_files 的顺序逐个产出解析结果
+
+    Args:
+        html_files: HTML 文件路径列表
+        workers: 解析进程数，大于 1 时在进程池中并行解析，结果仍按原顺序产出
+        parse: 解析函数（模块级函数，多进程时需可被 pickle）
+
+    Yields:
+        parse 的返回值（默认为 DataFrame 或 None）
+    """
+    if workers <= 1:
+        for html_file in html_files:
+            yield parse(html_file)
+        return
+
+    # 按块分发任务，减少进程间通信次数
+    chunksize = max(1, min(64, len(html_files) // (workers * 4)))
+    ctx = multiprocessing.get_context('spawn')
+    with ctx.Pool(processes=workers) as pool:
+        yield from pool.imap(parse, html_files, chunksize=chunksize)
+
+
+class MergeIndex:
+    """
+    增量合并索引：输出目录下的 .merge_index.pkl
+
+    记录每个 HTML 文件的大小、修改时间、内容哈希和解析出的行。
+    再次合并时，大小和修改时间都未变的文件直接使用缓存的行；
+    仅修改时间变化时比较内容哈希；其余文件重新解析。已删除文件的条目会被移除。
+    """
+
+    FILE_NAME = '.merge_index.pkl'
+    VERSION = 1
+
+    def __init__(self, output_dir):
+        """
+        加载（或创建）合并索引
+
+        Args:
+            output_dir: 输出目录
+        """
+        self.output_dir = output_dir
+        self.path = os.path.join(output_dir, self.FILE_NAME)
+        self.entries = {}
+        self.reused = 0
+        self.parsed = 0
+        self.removed = 0
+
+        try:
+            with open(self.path, 'rb') as f:
+                data = pickle.load(f)
+            if data.get('version') == self.VERSION:
+                self.entries = data['entries']
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"⚠ 合并索引损坏，将重新解析全部文件: {str(e)}")
+
+    @staticmethod
+    def _sha1(path):
+        sha1 = hashlib.sha1()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                sha1.update(chunk)
+        return sha1.hexdigest()
+
+    def refresh(self, html_files, workers=1):
+        """
+        更新索引，只重新解析新增或变化的文件
+
+        Args:
+            html_files: 当前全部 HTML 文件路径
+            workers: 重新解析时使用的进程数
+
+        Returns:
+            与 html_files 对应的行列表（解析失败的为 None）
+        """
+        rows_list = [None] * len(html_files)
+        changed = []
+        current = set()
+
+        for idx, html_file in enumerate(html_files):
+            key = os.path.relpath(html_file, self.output_dir)
+            current.add(key)
+            entry = self.entries.get(key)
+            try:
+                st = os.stat(html_file)
+            except OSError:
+                changed.append((idx, key, None))
+                continue
+
+            if entry is not None and entry['size'] == st.st_size:
+                if entry['mtime'] == st.st_mtime or entry['sha1'] == self._sha1(html_file):
+                    entry['mtime'] = st.st_mtime
+                    rows_list[idx] = entry['rows']
+                    self.reused += 1
+                    continue
+            changed.append((idx, key, st))
+
+        changed_files = [html_files[idx] for idx, _, _ in changed]
+        parsed = iter_parsed_tables(changed_files, workers, read_html_rows)
+        for (idx, key, st), html_file, rows in zip(changed, changed_files, parsed):
+            rows_list[idx] = rows
+            self.parsed += 1
+            if rows is None or st is None:
+                # 解析失败的文件不缓存，下次重新解析
+                self.entries.pop(key, None)
+                continue
+            self.entries[key] = {'size': st.st_size, 'mtime': st.st_mtime,
+                                 'sha1': self._sha1(html_file), 'rows': rows}
+
+        for key in set(self.entries) - current:
+            del self.entries[key]
+            self.removed += 1
+
+        return rows_list
+
+    def save(self):
+        """原子写出索引"""
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump({'version': self.VERSION, 'entries': self.entries}, f,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.path)
+
+
+def load_record_tables(output_dir):
+    """
+    从表格记录旁路文件读取全部表格（batch_table_recognition.py --table_records 写出）
+
+    Args:
+        output_dir: 输出目录
+
+    Returns:
+        [(对应的 HTML 文件路径, 行列表), ...]，按 HTML 文件路径排序，
+        与解析 HTML 文件时的顺序一致
+    """
+    from batch_table_recognition import TableRecordLog
+
+    tables = []
+    for image_name, record in TableRecordLog.load(output_dir).items():
+        for table in record['tables']:
+            html_file = os.path.join(output_dir, image_name,
+                                     f"{Path(image_name).name}_table_{table['index']}.html")
+            tables.append((html_file, table['rows']))
+    tables.sort(key=lambda item: item[0])
+    return tables
+
+
+def table_columns(rows):
+    """
+    表格参与合并的列名（流式写出前的预扫描，失败时不提示，正式解析时再提示）
+
+    Args:
+        rows: 行列表或 None
+
+    Returns:
+        列索引；空表格或转换失败（合并时跳过）为 None
+    """
+    try:
+        df = rows_to_dataframe(rows)
+    except Exception:
+        return None
+    if df is None or df.empty:
+        return None
+    return df.columns
+
+
+def read_html_columns(html_file):
+    """
+    只取 HTML 表格参与合并的列名，读取失败时为 None
+
+    只解析表头和第一行数据（与 rows_to_dataframe 一样取第一行为表头），不解析其余行。
+    后面的行比表头长时正式解析会失败并跳过该表格，这种情况在写出时核对。
+    """
+    try:
+        with open(html_file, 'r', encoding='utf-8') as f:
+            return table_columns(parse_table_head(f.read()))
+    except Exception:
+        return None
+
+
+def merged_columns(column_indexes):
+    """
+    各表格合并后的列名，与 pd.concat 合并这些表格得到的列完全相同
+
+    Args:
+        column_indexes: 各表格的列索引（None 表示跳过的表格）
+
+    Returns:
+        列名列表
+    """
+    frames = [pd.DataFrame(columns=columns) for columns in column_indexes if columns is not None]
+    if not frames:
+        return []
+    return list(pd.concat(frames, ignore_index=True).columns)
+
+
+class StreamingExcelWriter:
+    """
+    流式写出 Excel（openpyxl 只写模式）
+
+    表格逐个写入，不在内存中拼接 DataFrame，也不保留整个工作簿。
+    表头是预先算好的全部表格合并后的列（merged_columns），各表格的列按列名对应，
+    缺少的列留空，与 pd.concat 的结果一致；去重与 drop_duplicates 一致
+    （保留第一次出现的行），只保存每行的摘要。
+    单个工作表写满 Excel 的 1,048,576 行上限时自动换到新工作表（Sheet2、Sheet3...），
+    每个工作表都带表头。
+    """
+
+    MAX_ROWS = 1048576
+
+    def __init__(self, path, columns):
+        """
+        Args:
+            path: 输出的 xlsx 文件路径
+            columns: 合并后的列名
+        """
+        from openpyxl import Workbook
+
+        self.path = path
+        self.columns = list(columns)
+        self.workbook = Workbook(write_only=True)
+        self.sheet = None
+        self.sheet_rows = 0
+        self.sheets = 0
+        self.rows_written = 0
+        self.duplicates = 0
+        self._seen = set()
+
+    def _new_sheet(self):
+        self.sheets += 1
+        self.sheet = self.workbook.create_sheet(f"Sheet{self.sheets}")
+        self.sheet.append(self.columns)
+        self.sheet_rows = 1
+
+    def _positions(self, columns):
+        """各列在合并表头中的位置（同名列按出现次序对应）"""
+        slots = {}
+        for pos, name in enumerate(self.columns):
+            slots.setdefault(name, []).append(pos)
+        used = {}
+        positions = []
+        for name in columns:
+            nth = used.get(name, 0)
+            used[name] = nth + 1
+            positions.append(slots[name][nth])
+        return positions
+
+    def write_table(self, df):
+        """
+        写入一个表格
+
+        Args:
+            df: pandas DataFrame，列须包含在合并表头中
+
+        Returns:
+            写入的行数（不含重复行）
+        """
+        positions = self._positions(list(df.columns))
+        written = 0
+        for values in df.itertuples(index=False, name=None):
+            row = [None] * len(self.columns)
+            for pos, value in zip(positions, values):
+                row[pos] = None if pd.isna(value) else value
+
+            key = hashlib.blake2b(repr(row).encode('utf-8'), digest_size=16).digest()
+            if key in self._seen:
+                self.duplicates += 1
+                continue
+            self._seen.add(key)
+
+            if self.sheet is None or self.sheet_rows >= self.MAX_ROWS:
+                self._new_sheet()
+            self.sheet.append(row)
+            self.sheet_rows += 1
+            written += 1
+
+        self.rows_written += written
+        return written
+
+    def close(self):
+        """保存文件"""
+        if self.sheet is None:
+            self._new_sheet()
+        self.workbook.save(self.path)
+
+
+def merge_tables(output_dir, merged_file='merged_results.xlsx', workers=1, from_records=False,
+                 incremental=False, stream=False):
     """
     合并所有表格结果
 
     Args:
         output_dir: 输出目录（包含各个图片的识别结果子目录）
         merged_file: 合并后的文件名
+        workers: 并行解析 HTML 的进程数
+        from_records: 是否直接读取表格记录旁路文件，不读取、解析 HTML 文件
+        incremental: 是否使用增量合并索引，只重新解析新增或变化的 HTML 文件
+        stream: 是否边解析边流式写出 Excel（不在内存中合并，超过行数上限时自动分表）；
+                先预扫描各表格的表头行得到合并表头，结果与默认方式相同
     """
     print("=" * 80)
     print("  合并表格识别结果")
@@ -80,45 +405,121 @@ def merge_tables(output_dir, merged_file='merged_results.xlsx'):
         print(f"错误: 目录不存在 {output_dir}")
         return False
 
-    # 查找所有 HTML 文件
-    html_files = []
-    for root, dirs, files in os.walk(output_dir):
-        for file in files:
-            if file.endswith('.html'):
-                html_files.append(os.path.join(root, file))
-
-    # 按文件名排序
-    html_files.sort()
-
-    print(f"找到 {len(html_files)} 个 HTML 文件\n")
-
-    if not html_files:
-        print("未找到任何 HTML 文件！")
-        return False
+    if from_records:
+        # 表格记录已包含单元格文本，不必读取 HTML 文件
+        record_tables = load_record_tables(output_dir)
+        html_files = [html_file for html_file, _ in record_tables]
+        parsed_tables = (rows_to_dataframe(rows) for _, rows in record_tables)
+        if stream:
+            table_column_indexes = (table_columns(rows) for _, rows in record_tables)
+
+        print(f"从表格记录读取 {len(html_files)} 个表格\n")
+        if not html_files:
+            print("未找到任何表格记录！（识别时需指定 --table_records）")
+            return False
+    else:
+        # 查找所有 HTML 文件
+        html_files = []
+        for root, dirs, files in os.walk(output_dir):
+            for file in files:
+                if file.endswith('.html'):
+                    html_files.append(os.path.join(root, file))
+
+        # 按文件名排序
+        html_files.sort()
+
+        print(f"找到 {len(html_files)} 个 HTML 文件\n")
+        if workers > 1:
+            print(f"使用 {workers} 个进程并行解析\n")
+
+        if not html_files:
+            print("未找到任何 HTML 文件！")
+            return False
+
+        if incremental:
+            index = MergeIndex(output_dir)
+            rows_list = index.refresh(html_files, workers)
+            index.save()
+            print(f"增量合并: 复用 {index.reused} 个，重新解析 {index.parsed} 个，"
+                  f"移除已删除文件 {index.removed} 个\n")
+            parsed_tables = (table_from_rows(rows, html_file)
+                             for html_file, rows in zip(html_files, rows_list))
+            if stream:
+                table_column_indexes = (table_columns(rows) for rows in rows_list)
+        else:
+            parsed_tables = iter_parsed_tables(html_files, workers)
+            if stream:
+                # 预扫描只保留列名，不在内存中保留表格内容
+                table_column_indexes = iter_parsed_tables(html_files, workers, read_html_columns)
+
+    output_path = os.path.join(output_dir, merged_file)
+    writer = None
+    if stream:
+        # 先确定合并后的表头：表格列名不同时与 pd.concat 一样按列名对齐，只写一个工作表
+        print("流式写出: 预扫描表格列名...")
+        try:
+            # 每个表格只保留列索引，写出时用来核对预扫描结果
+            table_column_indexes = list(table_column_indexes)
+            columns = merged_columns(table_column_indexes)
+        except Exception as e:
+            # 与默认方式一样：列名无法对齐（如表头有重复列名）时合并失败
+            print(f"\n合并失败: {str(e)}")
+            import traceback
+            traceback.print_exc()
+            return False
+        print(f"  合并后共 {len(columns)} 列\n")
+        writer = StreamingExcelWriter(output_path, columns)
 
     # 合并所有表格
     all_dfs = []
     success_count = 0
+    written_columns = []
+    late_skipped = 0
 
-    for idx, html_file in enumerate(html_files, 1):
+    for idx, (html_file, df) in enumerate(zip(html_files, parsed_tables), 1):
         file_name = Path(html_file).stem
         print(f"[{idx}/{len(html_files)}] 处理: {file_name}")
 
-        df = parse_html_table(html_file)
-
         if df is not None and not df.empty:
             # 添加来源列（可选）
             # df['来源文件'] = file_name
-            all_dfs.append(df)
+            if writer is not None:
+                writer.write_table(df)
+                written_columns.append(df.columns)
+            else:
+                all_dfs.append(df)
             success_count += 1
             print(f"  ✓ 成功，{len(df)} 行")
         else:
             print(f"  ⚠ 跳过（空表格）")
+            if writer is not None and table_column_indexes[idx - 1] is not None:
+                late_skipped += 1
 
-    if not all_dfs:
+    if not success_count:
         print("\n没有成功解析任何表格！")
         return False
 
+    if writer is not None:
+        if late_skipped and merged_columns(written_columns) != writer.columns:
+            print(f"\n  ⚠ {late_skipped} 个表格的表头行和第一行数据有效，但后面的行比表头长而被跳过；"
+                  f"合并表头仍包含只出现在这些表格中的列")
+        if writer.duplicates > 0:
+            print(f"\n  移除 {writer.duplicates} 行重复数据")
+        print(f"\n正在保存...")
+        writer.close()
+
+        print("\n" + "=" * 80)
+        print("合并完成！")
+        print("=" * 80)
+        print(f"成功处理: {success_count}/{len(html_files)} 个文件")
+        print(f"总行数: {writer.rows_written}")
+        print(f"总列数: {len(writer.columns)}")
+        if writer.sheets > 1:
+            print(f"工作表数: {writer.sheets}")
+        print(f"输出文件: {output_path}")
+        print("=" * 80)
+        return True
+
     # 合并所有 DataFrame
     print(f"\n正在合并 {len(all_dfs)} 个表格...")
 
@@ -135,7 +536,6 @@ def merge_tables(output_dir, merged_file='merged_results.xlsx'):
             print(f"  移除 {removed_rows} 行重复数据")
 
         # 保存到 Excel
-        output_path = os.path.join(output_dir, merged_file)
         merged_df.to_excel(output_path, index=False, engine='openpyxl')
 
         print("\n" + "=" * 80)
@@ -168,6 +568,18 @@ def main():
 
   # 指定输出文件名
   python merge_results.py --input_dir output --output merged.xlsx
+
+  # 大量表格时用 8 个进程并行解析
+  python merge_results.py --input_dir output --workers 8
+
+  # 识别时指定了 --table_records：直接读取表格记录，不解析 HTML
+  python merge_results.py --input_dir output --from_records
+
+  # 定期追加图片的目录：只重新解析新增或变化的 HTML
+  python merge_results.py --input_dir output --incremental
+
+  # 结果很大时边解析边写出（超过 1,048,576 行自动分表）
+  python merge_results.py --input_dir output --stream
         """
     )
 
@@ -175,11 +587,21 @@ def main():
                         help='识别结果目录（默认: output）')
     parser.add_argument('--output', type=str, default='merged_results.xlsx',
                         help='合并后的文件名（默认: merged_results.xlsx）')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='并行解析 HTML 的进程数（默认: 1）')
+    parser.add_argument('--from_records', action='store_true',
+                        help='直接读取识别时写出的表格记录（--table_records），不解析 HTML 文件')
+    parser.add_argument('--incremental', action='store_true',
+                        help='增量合并：用输出目录中的合并索引缓存解析结果，只重新解析新增或变化的 HTML')
+    parser.add_argument('--stream', action='store_true',
+                        help='流式写出 Excel：先预扫描各表格列名得到合并表头，再逐个写出表格，不在内存中合并；'
+                             '结果与默认方式相同，超过 1,048,576 行时自动换到新工作表')
 
     args = parser.parse_args()
 
     try:
-        success = merge_tables(args.input_dir, args.output)
+        success = merge_tables(args.input_dir, args.output, args.workers, args.from_records,
+                               args.incremental, args.stream)
         return 0 if success else 1
 
     except KeyboardInterrupt:
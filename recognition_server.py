@@ -0,0 +1,469 @@
+# -*- coding: utf-8 -*-
+"""
+表格识别服务
+由 batch_table_recognition.py --serve 启动，保持 PPStructure 模型常驻内存，
+通过本地 HTTP 或 Unix socket 接收识别请求，避免每次调用都重新加载模型
+
+接口:
+  POST /recognize          请求体为图片文件的原始字节，返回 JSON
+  POST /recognize?format=html  只返回表格 HTML
+  POST /recognize?lang=en      指定语言（其他语言的模型首次请求时加载）
+  GET  /health             服务状态
+"""
+
+import os
+import json
+import time
+import queue
+import socket
+import threading
+from datetime import datetime
+from concurrent.futures import Future
+from socketserver import ThreadingMixIn, UnixStreamServer
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from batch_table_recognition import BatchTableRecognizer, SUPPORTED_LANGS
+
+
+# 单个请求体的大小上限（50MB）
+MAX_REQUEST_BYTES = 50 * 1024 * 1024
+
+
+def result_to_json(result):
+    """
+    将 PPStructure 识别结果转换为可序列化为 JSON 的结构
+
+    去掉区域裁剪图（img 字段），numpy 数组转为列表。
+
+    Args:
+        result: PPStructure 识别结果
+
+    Returns:
+        {'tables': [...], 'regions': [...]}
+    """
+    regions = []
+    tables = []
+    for item in result or []:
+        region = {k: v for k, v in item.items() if k != 'img'}
+        regions.append(region)
+        if item.get('type') == 'table':
+            tables.append({
+                'index': len(tables),
+                'bbox': item.get('bbox'),
+                'html': item.get('res', {}).get('html', '')
+            })
+    return {'tables': tables, 'regions': regions}
+
+
+def _json_default(obj):
+    """json.dumps 的兜底转换（numpy 数组和数值）"""
+    if hasattr(obj, 'tolist'):
+        return obj.tolist()
+    return str(obj)
+
+
+class MicroBatcher:
+    """
+    推理请求微批处理器
+
+    后台调度线程收集请求，凑满 max_batch_size 个或等待 max_wait_ms 毫秒后
+    一次性交给 process_batch 处理，再把结果分别返回给各个调用方。
+    调度线程是唯一调用引擎的线程，请求之间不再争抢引擎锁。
+    """
+
+    _STOP = object()
+
+    def __init__(self, process_batch, max_batch_size=8, max_wait_ms=10):
+        """
+        初始化微批处理器
+
+        Args:
+            process_batch: 批处理函数，输入请求列表，返回等长的结果列表
+            max_batch_size: 每批最多请求数
+            max_wait_ms: 第一个请求到达后最多等待多少毫秒凑批（越大吞吐越高、延迟越大）
+        """
+        self.process_batch = process_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0, max_wait_ms) / 1000.0
+        self.batches = 0
+        self.items = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='MicroBatcher', daemon=True)
+        self._thread.start()
+
+    @property
+    def average_batch_size(self):
+        return self.items / self.batches if self.batches else 0.0
+
+    def submit(self, item):
+        """
+        提交一个请求
+
+        Returns:
+            Future，完成后为该请求的结果
+        """
+        future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def close(self):
+        """处理完已提交的请求后停止调度线程"""
+        self._queue.put(self._STOP)
+        self._thread.join()
+
+    def _collect(self, first):
+        """从第一个请求开始凑批，返回 (批次, 是否收到停止信号)"""
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    entry = self._queue.get(timeout=remaining)
+                else:
+                    entry = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if entry is self._STOP:
+                return batch, True
+            batch.append(entry)
+        return batch, False
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is self._STOP:
+                break
+            batch, stopping = self._collect(first)
+
+            items = [item for item, _ in batch]
+            try:
+                results = self.process_batch(items)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+            else:
+                for (_, future), result in zip(batch, results):
+                    future.set_result(result)
+
+            self.batches += 1
+            self.items += len(batch)
+
+
+class RecognitionService:
+    """
+    识别服务核心：管理常驻识别器、请求排队和并发限制
+
+    同一时刻最多 max_concurrency 个请求在处理（解码、推理、编码响应），
+    再有最多 max_queue 个请求排队等待，超出直接拒绝。
+    引擎不是线程安全的：batch_size 为 1 时推理调用通过锁串行执行，
+    大于 1 时交给 MicroBatcher 的调度线程凑批执行。
+    """
+
+    def __init__(self, recognizer, max_concurrency=4, max_queue=32,
+                 batch_size=1, batch_wait_ms=10):
+        """
+        初始化识别服务
+
+        Args:
+            recognizer: 已加载模型的 BatchTableRecognizer
+            max_concurrency: 同时处理的请求数（也是单批请求数的上限）
+            max_queue: 排队等待的请求上限
+            batch_size: 微批大小，1 表示逐张推理
+            batch_wait_ms: 微批最长等待时间（毫秒）
+        """
+        self.recognizer = recognizer
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._engine_lock = threading.Lock()
+        self._state_lock = threading.Lock()
+        self.pending = 0
+        self.served = 0
+        self.failed = 0
+        self.rejected = 0
+        self.started_at = datetime.now()
+
+        self.batcher = None
+        if batch_size > 1:
+            self.batcher = MicroBatcher(self._recognize_batch, batch_size, batch_wait_ms)
+
+    def _recognize_batch(self, requests):
+        """
+        逐张识别一批已解码的图片
+
+        PPStructure 每次调用只接受一张图片，这里在调度线程中紧凑循环调用，
+        省去每个请求单独加锁、线程切换的开销。
+
+        Args:
+            requests: [(图片数组, 坐标变换, 名称, 语言), ...]
+
+        Returns:
+            识别结果列表
+        """
+        return [self.recognizer.recognize_single_image(name, preloaded=(img, None, transform),
+                                                       lang=lang)
+                for img, transform, name, lang in requests]
+
+    def try_admit(self):
+        """
+        请求进入服务，排队已满时返回 False
+        """
+        with self._state_lock:
+            if self.pending >= self.max_concurrency + self.max_queue:
+                self.rejected += 1
+                return False
+            self.pending += 1
+            return True
+
+    def release(self, ok):
+        """请求处理结束"""
+        with self._state_lock:
+            self.pending -= 1
+            if ok:
+                self.served += 1
+            else:
+                self.failed += 1
+
+    def recognize(self, data, name='request', lang=None):
+        """
+        识别一张图片
+
+        Args:
+            data: 图片文件内容
+            name: 用于日志的请求名称
+            lang: 使用的语言，为 None 时使用服务的默认语言
+
+        Returns:
+            (识别结果, 错误信息)
+        """
+        lang = lang or self.recognizer.lang
+        if lang not in SUPPORTED_LANGS:
+            return None, f"不支持的语言 {lang}"
+
+        with self._slots:
+            img, error, decode_scale = self.recognizer.decode_image(data)
+            if img is None:
+                return None, error
+            img, transform = self.recognizer.preprocess_image(img, decode_scale)
+
+            if self.batcher is not None:
+                result = self.batcher.submit((img, transform, name, lang)).result()
+            else:
+                with self._engine_lock:
+                    result = self.recognizer.recognize_single_image(
+                        name, preloaded=(img, None, transform), lang=lang)
+            if not result:
+                return None, "未检测到内容"
+            return result, None
+
+    def status(self):
+        """服务状态"""
+        with self._state_lock:
+            return {
+                'status': 'ok',
+                'lang': self.recognizer.lang,
+                'loaded_langs': sorted(self.recognizer._engines),
+                'pending': self.pending,
+                'served': self.served,
+                'failed': self.failed,
+                'rejected': self.rejected,
+                'max_concurrency': self.max_concurrency,
+                'max_queue': self.max_queue,
+                'batch_size': self.batcher.max_batch_size if self.batcher else 1,
+                'average_batch_size': self.batcher.average_batch_size if self.batcher else 1.0,
+                'uptime': (datetime.now() - self.started_at).total_seconds()
+            }
+
+
+class RecognitionRequestHandler(BaseHTTPRequestHandler):
+    """HTTP 请求处理器"""
+
+    server_version = 'TableRecognitionServer/1.0'
+    protocol_version = 'HTTP/1.1'
+
+    @property
+    def service(self):
+        return self.server.service
+
+    def address_string(self):
+        # Unix socket 没有客户端地址
+        if isinstance(self.client_address, tuple) and self.client_address:
+            return str(self.client_address[0])
+        return 'unix'
+
+    def _send(self, status, body, content_type='application/json; charset=utf-8', close=False):
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        if close:
+            self.send_header('Connection', 'close')
+            self.close_connection = True
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status, obj, close=False):
+        self._send(status, json.dumps(obj, ensure_ascii=False, default=_json_default), close=close)
+
+    def _reject(self, status, error):
+        """未读取请求体就返回错误：关闭连接，避免残留的请求体被当作下一个请求解析"""
+        self._send_json(status, {'error': error}, close=True)
+
+    def do_GET(self):
+        if urlparse(self.path).path == '/health':
+            self._send_json(200, self.service.status())
+        else:
+            self._send_json(404, {'error': '未知接口'})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != '/recognize':
+            self._reject(404, '未知接口')
+            return
+
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+        except ValueError:
+            length = -1
+        if length <= 0:
+            self._reject(400, '请求体为空，请以原始字节发送图片')
+            return
+        if length > MAX_REQUEST_BYTES:
+            self._reject(413, f'图片超过 {MAX_REQUEST_BYTES // (1024 * 1024)}MB 上限')
+            return
+
+        query = parse_qs(url.query)
+        lang = query.get('lang', [None])[0]
+        if lang is not None and lang not in SUPPORTED_LANGS:
+            self._reject(400, f"不支持的语言 {lang}（可选: {'、'.join(SUPPORTED_LANGS)}）")
+            return
+
+        # 先判断是否接纳，过载时不必读取（缓存）请求体
+        if not self.service.try_admit():
+            self._reject(503, '服务繁忙，请稍后重试')
+            return
+
+        ok = False
+        try:
+            data = self.rfile.read(length)
+            if len(data) < length:
+                # 客户端提前断开
+                self.close_connection = True
+                return
+
+            name = query.get('name', ['request'])[0]
+            start = datetime.now()
+            result, error = self.service.recognize(data, name, lang)
+            elapsed = (datetime.now() - start).total_seconds()
+
+            if result is None:
+                self._send_json(422, {'error': error})
+                return
+
+            payload = result_to_json(result)
+            if query.get('format', ['json'])[0] == 'html':
+                html = '\n'.join(table['html'] for table in payload['tables'])
+                self._send(200, html, 'text/html; charset=utf-8')
+            else:
+                payload['elapsed_time'] = elapsed
+                self._send_json(200, payload)
+            ok = True
+        except Exception as e:
+            self._send_json(500, {'error': str(e)})
+        finally:
+            self.service.release(ok)
+
+
+class ThreadingUnixHTTPServer(ThreadingMixIn, UnixStreamServer):
+    """监听 Unix socket 的多线程 HTTP 服务"""
+
+    daemon_threads = True
+
+    def server_bind(self):
+        UnixStreamServer.server_bind(self)
+        # BaseHTTPRequestHandler 需要这两个属性
+        self.server_name = 'localhost'
+        self.server_port = 0
+
+
+def create_server(service, host='127.0.0.1', port=8866, unix_socket=None):
+    """
+    创建 HTTP 服务
+
+    Args:
+        service: RecognitionService
+        host: 监听地址
+        port: 监听端口
+        unix_socket: Unix socket 路径，指定时忽略 host/port
+
+    Returns:
+        已绑定的服务器对象
+    """
+    if unix_socket:
+        if not hasattr(socket, 'AF_UNIX'):
+            raise RuntimeError("当前系统不支持 Unix socket，请使用 --host/--port")
+        if os.path.exists(unix_socket):
+            os.remove(unix_socket)
+        server = ThreadingUnixHTTPServer(unix_socket, RecognitionRequestHandler)
+    else:
+        server = ThreadingHTTPServer((host, port), RecognitionRequestHandler)
+    server.service = service
+    return server
+
+
+def serve(args):
+    """
+    以服务模式运行（由 batch_table_recognition.py --serve 调用）
+
+    Args:
+        args: 命令行参数
+
+    Returns:
+        退出码
+    """
+    recognizer = BatchTableRecognizer(
+        output_dir=args.output_dir,
+        use_gpu=(args.device == 'gpu'),
+        lang=args.lang,
+        cache_dir=args.cache_dir,
+        cache_size_mb=args.cache_size_mb,
+        cache_phash=args.cache_phash,
+        max_side=args.max_side,
+        crop_border=args.crop_border,
+        grayscale=args.grayscale,
+        fast_decode=args.fast_decode,
+        table_only=args.table_only,
+        cpu_threads=args.cpu_threads,
+        enable_mkldnn=args.enable_mkldnn
+    )
+    # 启动监听前加载默认语言的模型，第一个请求不必等待
+    recognizer.get_engine(recognizer.lang)
+    service = RecognitionService(recognizer, args.max_concurrency, args.max_queue,
+                                 args.batch_size, args.batch_wait_ms)
+    server = create_server(service, args.host, args.port, args.unix_socket)
+
+    address = args.unix_socket or f"http://{args.host}:{args.port}"
+    print("=" * 80)
+    print(f"识别服务已启动: {address}")
+    print(f"并发处理: {service.max_concurrency}，排队上限: {service.max_queue}")
+    if service.batcher is not None:
+        print(f"微批处理: 每批最多 {args.batch_size} 张，最长等待 {args.batch_wait_ms} 毫秒")
+    print("  POST /recognize   请求体为图片字节，返回表格 JSON（?format=html 返回 HTML）")
+    print("  GET  /health      服务状态")
+    print("=" * 80)
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n\n服务已停止")
+    finally:
+        server.server_close()
+        if service.batcher is not None:
+            service.batcher.close()
+        if args.unix_socket and os.path.exists(args.unix_socket):
+            os.remove(args.unix_socket)
+    return 0
@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+"""
+表格 HTML 快速解析
+PPStructure 输出的表格 HTML 结构很窄（<table><tr><td>，少量 thead/tbody 和行内标签），
+这里用正则逐个扫描标签提取单元格文本，不构建文档树。
+
+结果与 BeautifulSoup(html, 'html.parser') 的
+    soup.find('table').find_all('tr') → tr.find_all(['td', 'th']) → td.get_text(strip=True)
+完全一致。遇到快速路径无法保证一致的输入（嵌套表格、注释、script/style、
+未闭合的单元格、不常见的实体等）时，自动改用 BeautifulSoup 解析。
+"""
+
+import re
+import html as html_lib
+
+# 与 html.parser 的标签名规则一致；属性值中可以包含引号括起来的 >
+_TAG = re.compile(r'''<(/?)([a-zA-Z][^\t\n\r\f />\x00]*)((?:[^>"']|"[^"]*"|'[^']*')*)>''')
+_TABLE_START = re.compile(r'<table(?=[\t\n\r\f />])', re.IGNORECASE)
+
+# 表格之前需要整体跳过的注释和原始文本元素（save_results 写出的 <style>）
+_SKIP_START = re.compile(r'<!--|<(script|style)(?=[\t\n\r\f />])', re.IGNORECASE)
+_COMMENT_END = re.compile(r'--\s*>')
+
+# 快速路径只处理解码结果与 BeautifulSoup 一致的实体
+_ENTITY = re.compile(r'&(?:#([0-9]+)|#[xX]([0-9a-fA-F]+)|amp|lt|gt|quot|nbsp);')
+
+# 合并单元格属性（值须整体为整数，与 int() 解析 BeautifulSoup 属性值的结果一致）
+_SPAN_ATTR = re.compile(r'''(?:^|[\s"'])(rowspan|colspan)\s*=\s*'''
+                        r'''(?:"\s*([0-9]+)\s*"|'\s*([0-9]+)\s*'|([0-9]+)(?=[\s/]|$))''', re.IGNORECASE)
+
+# 结束时会隐式关闭 tr/td 的分组标签
+_SECTION_TAGS = ('thead', 'tbody', 'tfoot')
+
+
+def _cell_text(segment):
+    """
+    解码一段单元格文本并去掉首尾空白
+
+    Returns:
+        文本，快速路径无法保证与 BeautifulSoup 一致时返回 None
+    """
+    if '<' in segment:
+        return None
+    if '&' in segment:
+        matches = _ENTITY.findall(segment)
+        if len(matches) != segment.count('&'):
+            return None
+        for decimal, hexadecimal in matches:
+            if decimal or hexadecimal:
+                code = int(decimal) if decimal else int(hexadecimal, 16)
+                # 控制字符、C1 区间和超出范围的码点由 BeautifulSoup 特殊处理
+                if code < 32 or 127 <= code < 160 or 0xD800 <= code < 0xE000 or code > 0x10FFFF:
+                    return None
+        segment = html_lib.unescape(segment)
+    return segment.strip()
+
+
+def _find_table(html):
+    """
+    查找第一个表格的起始位置，跳过其前面的注释和 script/style 元素
+
+    Returns:
+        起始位置；没有表格时为 -1；无法确定时为 None
+    """
+    pos = 0
+    while True:
+        table = _TABLE_START.search(html, pos)
+        skip = _SKIP_START.search(html, pos)
+        if skip is None or (table is not None and skip.start() > table.start()):
+            return table.start() if table is not None else -1
+
+        if skip.group(1) is None:
+            end = _COMMENT_END.search(html, skip.end())
+            # 注释结束标记的写法有歧义时交给 BeautifulSoup
+            if end is None or end.group() != '-->':
+                return None
+        else:
+            end = re.compile(r'</\s*%s\s*>' % skip.group(1), re.IGNORECASE).search(html, skip.end())
+            if end is None:
+                return None
+        pos = end.end()
+
+
+def _span(value):
+    """合并单元格属性值，无效时为 1"""
+    try:
+        return max(1, int(value))
+    except (TypeError, ValueError):
+        return 1
+
+
+def _parse_fast(html, spans=None, max_rows=None):
+    """
+    快速路径
+
+    Args:
+        html: HTML 文本
+        spans: 不为 None 时追加合并单元格 [行号, 单元格序号, rowspan, colspan]
+        max_rows: 不为 None 时取到这么多行就停止，不再扫描其余部分
+
+    Returns:
+        行列表，无法保证与 BeautifulSoup 一致时返回 None
+    """
+    start = _find_table(html)
+    if start is None:
+        return None
+    if start < 0:
+        return []
+
+    table_tag = _TAG.match(html, start)
+    if table_tag is None or table_tag.group(3).rstrip().endswith('/'):
+        return None
+
+    rows = []
+    cells = None        # 当前行的单元格，不在行内时为 None
+    cell_tag = None     # 当前单元格的标签名（td/th）
+    parts = None        # 当前单元格的文本片段
+    pos = table_tag.end()
+
+    for tag in _TAG.finditer(html, pos):
+        segment = html[pos:tag.start()]
+        if parts is not None:
+            if segment:
+                text = _cell_text(segment)
+                if text is None:
+                    return None
+                if text:
+                    parts.append(text)
+        elif '<' in segment:
+            return None
+        pos = tag.end()
+
+        closing, name, attrs = tag.groups()
+        name = name.lower()
+        self_closing = attrs.rstrip().endswith('/')
+
+        if name in ('td', 'th'):
+            if self_closing:
+                return None
+            if not closing:
+                if cells is None or parts is not None:
+                    return None
+                cell_tag = name
+                parts = []
+                if spans is not None and 'span' in attrs.lower():
+                    values = {key.lower(): _span(''.join(value))
+                              for key, *value in _SPAN_ATTR.findall(attrs)}
+                    rowspan, colspan = values.get('rowspan', 1), values.get('colspan', 1)
+                    if rowspan > 1 or colspan > 1:
+                        spans.append([len(rows), len(cells), rowspan, colspan])
+            else:
+                if parts is None or name != cell_tag:
+                    return None
+                cells.append(''.join(parts))
+                parts = None
+        elif name == 'tr':
+            if self_closing:
+                return None
+            if not closing:
+                if cells is not None:
+                    return None
+                cells = []
+            else:
+                if cells is None or parts is not None:
+                    return None
+                if cells:
+                    rows.append(cells)
+                    if len(rows) == max_rows:
+                        return rows
+                cells = None
+        elif name == 'table':
+            if not closing or cells is not None:
+                return None
+            return rows
+        elif name in ('script', 'style'):
+            return None
+        elif name in _SECTION_TAGS and closing and cells is not None:
+            return None
+
+    # 缺少 </table>：剩余部分不能有未闭合的行或注释
+    if cells is not None or '<' in html[pos:]:
+        return None
+    return rows
+
+
+def _parse_with_bs4(html, spans=None):
+    """BeautifulSoup 解析（快速路径无法处理时使用）"""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, 'html.parser')
+    table = soup.find('table')
+    if table is None:
+        return []
+
+    rows = []
+    for tr in table.find_all('tr'):
+        tds = tr.find_all(['td', 'th'])
+        if not tds:
+            continue
+        if spans is not None:
+            for idx, td in enumerate(tds):
+                rowspan, colspan = _span(td.get('rowspan')), _span(td.get('colspan'))
+                if rowspan > 1 or colspan > 1:
+                    spans.append([len(rows), idx, rowspan, colspan])
+        rows.append([td.get_text(strip=True) for td in tds])
+    return rows
+
+
+def parse_table_rows(html):
+    """
+    提取 HTML 中第一个表格的单元格文本
+
+    Args:
+        html: HTML 文本
+
+    Returns:
+        行列表 [[单元格文本, ...], ...]，不含没有单元格的行；没有表格时返回空列表
+    """
+    rows = _parse_fast(html)
+    if rows is None:
+        rows = _parse_with_bs4(html)
+    return rows
+
+
+def parse_table_head(html, max_rows=2):
+    """
+    只提取 HTML 中第一个表格的前几行（如表头和第一行数据），取够行数后不再扫描其余部分
+
+    Args:
+        html: HTML 文本
+        max_rows: 行数
+
+    Returns:
+        parse_table_rows(html) 结果的前 max_rows 行
+    """
+    rows = _parse_fast(html, max_rows=max_rows)
+    if rows is None:
+        rows = _parse_with_bs4(html)[:max_rows]
+    return rows
+
+
+def parse_table(html):
+    """
+    提取 HTML 中第一个表格的单元格文本和合并单元格
+
+    Args:
+        html: HTML 文本
+
+    Returns:
+        (行列表, 合并单元格 [[行号, 单元格序号, rowspan, colspan], ...])，
+        行号和单元格序号与行列表的下标对应
+    """
+    spans = []
+    rows = _parse_fast(html, spans)
+    if rows is None:
+        spans = []
+        rows = _parse_with_bs4(html, spans)
+    return rows, spans